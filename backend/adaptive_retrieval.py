@@ -0,0 +1,190 @@
+import os
+import threading
+from llama_index.core.schema import NodeWithScore
+from backend.cache import get_cache, make_key
+
+
+# Both legs are always queried at full depth: a Pinecone query or a BM25 scoring pass
+# costs about the same for k=5 and k=15, while a second round trip to widen would not.
+# What the adaptive mode controls is how many candidates reach the cross-encoder.
+INITIAL_LEG_DEPTH = int(os.getenv("GRAVILOG_ADAPTIVE_INITIAL_DEPTH", "5"))
+FUSION_K = 60  # same constant as QueryFusionRetriever's reciprocal_rerank mode
+
+VECTOR_LEG = "vector"
+BM25_LEG = "bm25"
+# A hit is close to its leg's best hit, i.e. not clearly worse, within these margins:
+# cosine similarity for the vector leg, a fraction of the best score for BM25, whose
+# scores have no fixed scale. Fusion scores cannot tell this: they only depend on ranks.
+VECTOR_MARGIN = float(os.getenv("GRAVILOG_ADAPTIVE_VECTOR_MARGIN", "0.1"))
+BM25_MARGIN = float(os.getenv("GRAVILOG_ADAPTIVE_BM25_MARGIN", "0.5"))
+
+RERANK_CACHE_TTL = int(os.getenv("GRAVILOG_RERANK_CACHE_TTL", "604800"))
+
+
+class AdaptiveRetrievalStats:
+    """Thread-safe counters for which adaptive paths were taken"""
+
+    PATHS = [
+        "pool_narrow", "pool_widened",
+        "rerank_skipped", "rerank_shortened", "rerank_full",
+        "rerank_cache_hits", "rerank_cache_misses",
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.PATHS, 0)
+        self._requests = 0
+
+    def record(self, path, count=1):
+        with self._lock:
+            self._counts[path] += count
+
+    def record_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+            requests = self._requests
+        lookups = counts["rerank_cache_hits"] + counts["rerank_cache_misses"]
+        return {
+            "requests": requests,
+            "counts": counts,
+            "pool_widened_rate": counts["pool_widened"] / requests if requests else 0.0,
+            "rerank_skipped_rate": counts["rerank_skipped"] / requests if requests else 0.0,
+            "rerank_shortened_rate": counts["rerank_shortened"] / requests if requests else 0.0,
+            "rerank_cache_hit_rate": counts["rerank_cache_hits"] / lookups if lookups else 0.0,
+        }
+
+
+stats = AdaptiveRetrievalStats()
+
+
+def fuse_results(result_lists, top_k):
+    """Reciprocal rank fusion of several ranked NodeWithScore lists, keyed by node id"""
+    fused_scores = {}
+    nodes_by_id = {}
+    for results in result_lists:
+        for rank, node_with_score in enumerate(sorted(results, key=lambda n: n.score or 0.0, reverse=True)):
+            node_id = node_with_score.node.node_id
+            fused_scores[node_id] = fused_scores.get(node_id, 0.0) + 1.0 / (rank + FUSION_K)
+            nodes_by_id.setdefault(node_id, node_with_score.node)
+
+    ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=nodes_by_id[node_id], score=fused_scores[node_id]) for node_id in ranked_ids]
+
+
+def is_close(score, best, leg):
+    """Whether a hit scoring score is within the leg's margin of the leg's best hit"""
+    if leg == VECTOR_LEG:
+        return score >= best - VECTOR_MARGIN
+    return best > 0 and score >= best * (1 - BM25_MARGIN)
+
+
+def close_ids(leg, results):
+    """Ids of the hits close to the leg's best one; results are sorted by score"""
+    if not results:
+        return set()
+    best = results[0].score or 0.0
+    return {n.node.node_id for n in results if is_close(n.score or 0.0, best, leg)}
+
+
+def head_is_decisive(leg, results, depth):
+    """Whether the leg's best hit outside its top depth hits is clearly worse than its best hit"""
+    return len(results) <= depth or not is_close(results[depth].score or 0.0, results[0].score or 0.0, leg)
+
+
+def select_pool(leg_results, fusion_top_k, depth=INITIAL_LEG_DEPTH):
+    """Fuse the heads of the legs, or their full lists if a head cuts through close hits.
+
+    leg_results are (leg, results sorted by score) pairs. Returns (pool, ids of the hits
+    close to their leg's best, whether the pool was widened).
+    """
+    widened = not all(head_is_decisive(leg, results, depth) for leg, results in leg_results)
+    if not widened:
+        leg_results = [(leg, results[:depth]) for leg, results in leg_results]
+    pool = fuse_results([results for _, results in leg_results], fusion_top_k)
+    contenders = set().union(*(close_ids(leg, results) for leg, results in leg_results))
+    return pool, contenders, widened
+
+
+def adaptive_retrieve(question, legs, fusion_top_k):
+    """Retrieve from (leg, retriever) pairs and fuse as select_pool decides.
+
+    Returns (pool, ids of the hits close to their leg's best).
+    """
+    stats.record_request()
+    leg_results = [
+        (leg, sorted(retriever.retrieve(question), key=lambda n: n.score or 0.0, reverse=True))
+        for leg, retriever in legs
+    ]
+    pool, contenders, widened = select_pool(leg_results, fusion_top_k)
+    if widened:
+        stats.record("pool_widened")
+        print(f"📏 Adaptive retrieval: close hits beyond the top {INITIAL_LEG_DEPTH}, widened pool to {len(pool)} candidates")
+    else:
+        stats.record("pool_narrow")
+        print(f"📏 Adaptive retrieval: narrow pool of {len(pool)} candidates")
+    return pool, contenders
+
+
+def plan_rerank(pool, contenders, top_n):
+    """Decide how much of the pool the cross-encoder has to score.
+
+    Only candidates close to their leg's best hit can change places in a meaningful way.
+    Returns (path, nodes): for "rerank_skipped" the nodes are the result, otherwise the
+    candidates to rerank.
+    """
+    candidates = [n for n in pool if n.node.node_id in contenders]
+    if len(candidates) <= top_n:
+        rest = [n for n in pool if n.node.node_id not in contenders]
+        return "rerank_skipped", (candidates + rest)[:top_n]
+    if len(candidates) < len(pool):
+        return "rerank_shortened", candidates
+    return "rerank_full", candidates
+
+
+def rerank_cache_key(model_name, question, node):
+    # The content hash keeps an edited node with a stable id (e.g. a CSV row) from reusing its old score
+    return make_key(model_name, question, node.node_id, node.hash)
+
+
+def cached_rerank_scores(question, nodes, reranker, model_name):
+    """Cross-encoder scores for nodes, reusing cached (query, node content) scores"""
+    cache = get_cache("rerank")
+    scores = {}
+    missing = []
+    for node_with_score in nodes:
+        node_id = node_with_score.node.node_id
+        score = cache.get(rerank_cache_key(model_name, question, node_with_score.node))
+        if score is None:
+            missing.append(NodeWithScore(node=node_with_score.node, score=node_with_score.score))
+        else:
+            scores[node_id] = score
+
+    stats.record("rerank_cache_hits", len(scores))
+    stats.record("rerank_cache_misses", len(missing))
+
+    if missing:
+        # postprocess_nodes overwrites each node's score with the cross-encoder score
+        for scored in reranker.postprocess_nodes(missing, query_str=question):
+            node_id = scored.node.node_id
+            scores[node_id] = scored.score
+            cache.set(rerank_cache_key(model_name, question, scored.node), scored.score, expire=RERANK_CACHE_TTL)
+    return scores
+
+
+def adaptive_rerank(question, pool, contenders, reranker, model_name, top_n):
+    """Rerank only the candidates that are close to their leg's best hit"""
+    path, candidates = plan_rerank(pool, contenders, top_n)
+    stats.record(path)
+    if path == "rerank_skipped":
+        print(f"⏭️ Adaptive rerank: at most {top_n} close candidates, skipping cross-encoder")
+        return candidates
+
+    scores = cached_rerank_scores(question, candidates, reranker, model_name)
+    reranked = [NodeWithScore(node=n.node, score=scores.get(n.node.node_id)) for n in candidates]
+    reranked.sort(key=lambda n: n.score if n.score is not None else float("-inf"), reverse=True)
+    print(f"🎯 Adaptive rerank: scored {len(candidates)} of {len(pool)} candidates")
+    return reranked[:top_n]
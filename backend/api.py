@@ -0,0 +1,233 @@
+"""Headless JSON API for the risk assessment and follow-up QA.
+
+Serves the same pipeline as the Gradio UI without its UI payloads or resent chat
+history. Run it on its own with
+
+    uvicorn backend.api:app --host 0.0.0.0 --port 8000
+
+or use frontend/app.py or frontend/serve.py, which serve it next to the UI so it
+shares the warmed retrievers and models of each process.
+"""
+import asyncio
+import hmac
+import json
+import os
+from typing import Annotated, List, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from backend import rag_functions
+from backend import adaptive_retrieval
+from backend.llm_backends import router as llm_router
+from backend import profiling
+from backend.assessment import SYMPTOM_QUESTIONS, build_symptom_summary, run_risk_assessment
+
+
+MAX_BATCH_SIZE = int(os.getenv("GRAVILOG_API_MAX_BATCH", "32"))
+BATCH_CONCURRENCY = int(os.getenv("GRAVILOG_API_BATCH_CONCURRENCY", "4"))
+# Same cap as the chat textbox
+MAX_MESSAGE_CHARS = 1000
+# Ten chat turns as the UI builds them: user messages plus assistant messages cut to 200 chars
+MAX_CONVERSATION_CONTEXT_CHARS = 12000
+# Routes that change server state need "Authorization: Bearer <token>"; unset disables them
+ADMIN_TOKEN = os.getenv("GRAVILOG_ADMIN_TOKEN", "")
+
+
+Message = Annotated[str, Field(max_length=MAX_MESSAGE_CHARS)]
+
+
+class AssessmentRequest(BaseModel):
+    answers: List[Message] = Field(
+        ..., min_length=1, max_length=len(SYMPTOM_QUESTIONS),
+        description="Answers to the symptom questions, in the order returned by /v1/questions",
+    )
+
+
+class AssessmentResponse(BaseModel):
+    risk_level: str
+    recommended_action: str
+    analysis: str
+    parsed: bool
+
+
+class BatchAssessmentRequest(BaseModel):
+    items: List[AssessmentRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchAssessmentResponse(BaseModel):
+    results: List[AssessmentResponse]
+
+
+class QuestionRequest(BaseModel):
+    question: str = Field(..., min_length=1, max_length=MAX_MESSAGE_CHARS)
+    answers: List[Message] = Field(default_factory=list, max_length=len(SYMPTOM_QUESTIONS))
+    conversation_context: str = Field("", max_length=MAX_CONVERSATION_CONTEXT_CHARS)
+    symptom: Optional[str] = Field(
+        None, max_length=200,
+        description="Exact symptom to look up in the knowledge base tables; falls back to retrieval on a miss",
+    )
+
+
+class AnswerResponse(BaseModel):
+    answer: str
+
+
+class ProfilingSettings(BaseModel):
+    sample_rate: float = Field(..., ge=0.0, le=1.0)
+
+
+class SessionProfiling(BaseModel):
+    ttl_seconds: int = Field(profiling.DEFAULT_SESSION_TTL, gt=0)
+
+
+def require_admin_token(authorization: str = Header("")):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled, set GRAVILOG_ADMIN_TOKEN")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+# The routes, for apps that serve them next to something else (see frontend/app.py)
+router = APIRouter()
+
+
+@router.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+def readyz():
+    if rag_functions.retrieval_contexts.current.hybrid_retriever is None:
+        raise HTTPException(status_code=503, detail="Retriever not available")
+    return {"status": "ready", "retrieval_version": rag_functions.retrieval_contexts.current.version}
+
+
+@router.get("/admin/retrieval")
+def retrieval_status():
+    return {
+        "reload_generation": rag_functions.get_reload_generation(),
+        **rag_functions.retrieval_contexts.status(),
+    }
+
+
+@router.post("/admin/retrieval/reload", status_code=202, dependencies=[Depends(require_admin_token)])
+def reload_retrieval():
+    """Have every worker load the index from storage again (e.g. after insert_to_vectorstore.py) and hot-swap it in.
+
+    The request is recorded in the shared cache; each process picks it up within
+    GRAVILOG_RELOAD_POLL_SECONDS, whichever worker received this call.
+    """
+    rag_functions.request_reload()
+    return retrieval_status()
+
+
+@router.get("/v1/stats/retrieval")
+def retrieval_stats():
+    return {
+        "adaptive": rag_functions.ADAPTIVE_RETRIEVAL,
+        **adaptive_retrieval.stats.snapshot(),
+    }
+
+
+@router.get("/v1/stats/llm")
+def llm_stats():
+    return llm_router.stats()
+
+
+@router.get("/debug/profiling")
+def profiling_status():
+    return {
+        "mode": profiling.PROFILE_MODE,
+        "directory": profiling.PROFILE_DIR,
+        "sample_rate": profiling.get_sample_rate(),
+        "sessions": profiling.profiled_sessions(),
+    }
+
+
+@router.put("/debug/profiling", dependencies=[Depends(require_admin_token)])
+def update_profiling(settings: ProfilingSettings):
+    profiling.set_sample_rate(settings.sample_rate)
+    return profiling_status()
+
+
+@router.put("/debug/profiling/sessions/{session_id}", dependencies=[Depends(require_admin_token)])
+def profile_session(session_id: str, settings: SessionProfiling = SessionProfiling()):
+    profiling.enable_session(session_id, ttl=settings.ttl_seconds)
+    return profiling_status()
+
+
+@router.delete("/debug/profiling/sessions/{session_id}", dependencies=[Depends(require_admin_token)])
+def stop_profiling_session(session_id: str):
+    profiling.disable_session(session_id)
+    return profiling_status()
+
+
+@router.get("/v1/questions")
+def questions():
+    return {"questions": SYMPTOM_QUESTIONS}
+
+
+@router.post("/v1/assess", response_model=AssessmentResponse)
+def assess(request: AssessmentRequest):
+    return run_risk_assessment(request.answers)
+
+
+@router.post("/v1/assess/batch", response_model=BatchAssessmentResponse)
+async def assess_batch(request: BatchAssessmentRequest):
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def assess_one(item):
+        async with semaphore:
+            return await run_in_threadpool(run_risk_assessment, item.answers)
+
+    results = await asyncio.gather(*(assess_one(item) for item in request.items))
+    return {"results": results}
+
+
+@router.post("/v1/ask", response_model=AnswerResponse)
+def ask(request: QuestionRequest):
+    answer = rag_functions.get_direct_answer(
+        request.question,
+        build_symptom_summary(request.answers),
+        conversation_context=request.conversation_context,
+        is_risk_assessment=False,
+        symptom=request.symptom,
+    )
+    return {"answer": answer}
+
+
+@router.post("/v1/ask/stream")
+def ask_stream(request: QuestionRequest):
+    """Server-sent events: one `data` event per text delta, then a `done` event"""
+
+    def events():
+        for delta in rag_functions.stream_direct_answer(
+            request.question,
+            build_symptom_summary(request.answers),
+            conversation_context=request.conversation_context,
+            is_risk_assessment=False,
+            symptom=request.symptom,
+        ):
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+app = FastAPI(title="GraviLog Pregnancy Risk Assessment API")
+app.include_router(router)
+
+
+@app.on_event("startup")
+def start_reload_watcher():
+    # Runs in every uvicorn process, i.e. after the fork under frontend/serve.py
+    rag_functions.start_reload_watcher()
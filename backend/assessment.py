@@ -0,0 +1,73 @@
+import re
+from backend.rag_functions import get_direct_answer
+
+
+SYMPTOM_QUESTIONS = [
+    "Are you currently experiencing any unusual bleeding or discharge?",
+    "How would you describe your baby's movements today compared to yesterday?",
+    "Have you had any headaches that won't go away or that affect your vision?",
+    "Do you feel any pressure or pain in your pelvis or lower back?",
+    "Are you experiencing any other symptoms? (If yes, please describe briefly)"
+]
+
+RISK_ACTIONS = {
+    "Low": "✅ Continue routine prenatal care and self-monitoring",
+    "Medium": "⚠️ Contact your doctor within 24 hours",
+    "High": "🚨 Immediate visit to ER or OB emergency care required",
+}
+
+FALLBACK_RISK_LEVEL = "Medium"
+
+RISK_LEVEL_PATTERNS = [
+    r'\*\*Risk Level:\*\*\s*(Low|Medium|High)',
+    r'Risk Level:\s*\*\*(Low|Medium|High)\*\*',
+    r'Risk Level:\s*(Low|Medium|High)',
+    r'\*\*Risk Level:\*\*\s*<(Low|Medium|High)>',
+    r'Risk Level.*?<(Low|Medium|High)>',
+]
+
+
+def build_symptom_summary(answers):
+    """Pair each answer with its symptom question, in question order"""
+    if not answers:
+        return "No specific symptoms reported yet"
+
+    summary_parts = []
+    for question, answer in zip(SYMPTOM_QUESTIONS, answers):
+        summary_parts.append(f"{question}: {answer}")
+    return "\n".join(summary_parts)
+
+
+def parse_risk_level(text):
+    for pattern in RISK_LEVEL_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            risk_level = match.group(1).capitalize()
+            print(f"✅ Successfully parsed risk level: {risk_level}")
+            return risk_level
+
+    print(f"❌ Could not parse risk level from: {text[:200]}...")
+    return None
+
+
+def run_risk_assessment(answers):
+    """Run the RAG risk assessment for a list of answers to SYMPTOM_QUESTIONS"""
+    symptom_summary = build_symptom_summary(answers)
+
+    rag_query = f"Analyze these pregnancy symptoms for risk assessment:\n{symptom_summary}\n\nProvide risk level and medical recommendations."
+    detailed_analysis = get_direct_answer(rag_query, symptom_summary, is_risk_assessment=True)
+
+    print(f"🔍 RAG Response: {detailed_analysis[:300]}...")
+
+    risk_level = parse_risk_level(detailed_analysis)
+    parsed = risk_level is not None
+    if not parsed:
+        print("⚠️ RAG assessment failed, using fallback")
+        risk_level = FALLBACK_RISK_LEVEL
+
+    return {
+        "risk_level": risk_level,
+        "recommended_action": RISK_ACTIONS[risk_level],
+        "analysis": detailed_analysis,
+        "parsed": parsed,
+    }
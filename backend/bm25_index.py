@@ -0,0 +1,72 @@
+import os
+import json
+import bm25s
+import Stemmer
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+
+
+BM25_DIRNAME = "bm25"
+NODE_IDS_FILENAME = "node_ids.json"
+# Same tokenization as llama_index's BM25Retriever
+STOPWORDS = "en"
+stemmer = Stemmer.Stemmer("english")
+
+
+def persist_bm25_index(nodes, persist_dir):
+    """Index the text of nodes with bm25s and save it, with their ids, under persist_dir/bm25.
+
+    Returns the number of nodes indexed.
+    """
+    nodes = [node for node in nodes if node.get_content().strip()]
+    if not nodes:
+        return 0
+    path = os.path.join(persist_dir, BM25_DIRNAME)
+    corpus_tokens = bm25s.tokenize(
+        [node.get_content() for node in nodes], stopwords=STOPWORDS, stemmer=stemmer, show_progress=False
+    )
+    bm25 = bm25s.BM25()
+    bm25.index(corpus_tokens, show_progress=False)
+    # The corpus is not saved: hits are fetched from the docstore by id
+    bm25.save(path)
+    with open(os.path.join(path, NODE_IDS_FILENAME), "w") as f:
+        json.dump([node.node_id for node in nodes], f)
+    return len(nodes)
+
+
+class DocstoreBM25Retriever(BaseRetriever):
+    """BM25 over an index saved by persist_bm25_index, memory-mapped instead of loaded.
+
+    Only the vocabulary and one id per node stay resident; the nodes of each hit are
+    fetched from the docstore.
+    """
+
+    def __init__(self, bm25, node_ids, docstore, similarity_top_k=10, callback_manager=None, verbose=False):
+        self._bm25 = bm25
+        self._node_ids = node_ids
+        self._docstore = docstore
+        self.similarity_top_k = similarity_top_k
+        super().__init__(callback_manager=callback_manager, verbose=verbose)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, docstore, **kwargs):
+        """Load the BM25 index saved in persist_dir, or None if the build has none"""
+        path = os.path.join(persist_dir, BM25_DIRNAME)
+        if not os.path.exists(os.path.join(path, NODE_IDS_FILENAME)):
+            return None
+        bm25 = bm25s.BM25.load(path, mmap=True)
+        with open(os.path.join(path, NODE_IDS_FILENAME)) as f:
+            node_ids = json.load(f)
+        return cls(bm25, node_ids, docstore, **kwargs)
+
+    def _retrieve(self, query_bundle):
+        k = min(self.similarity_top_k, len(self._node_ids))
+        if not k:
+            return []
+        query_tokens = bm25s.tokenize(
+            query_bundle.query_str, stopwords=STOPWORDS, stemmer=stemmer, return_ids=False, show_progress=False
+        )
+        indexes, scores = self._bm25.retrieve(query_tokens, k=k, show_progress=False)
+        hit_scores = {self._node_ids[int(i)]: float(score) for i, score in zip(indexes[0], scores[0])}
+        nodes = self._docstore.get_nodes(list(hit_scores), raise_error=False)
+        return [NodeWithScore(node=node, score=hit_scores[node.node_id]) for node in nodes]
@@ -0,0 +1,26 @@
+import os
+import hashlib
+from diskcache import Cache
+
+
+CACHE_DIR = os.getenv("GRAVILOG_CACHE_DIR", "./cache")
+CACHE_SIZE_LIMIT = int(os.getenv("GRAVILOG_CACHE_SIZE_LIMIT", str(512 * 1024 * 1024)))
+
+_caches = {}
+
+
+def get_cache(name):
+    """Return a named on-disk cache that every worker process can share"""
+    # SQLite connections must not cross a fork, so each process opens its own handle
+    key = (os.getpid(), name)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = Cache(os.path.join(CACHE_DIR, name), size_limit=CACHE_SIZE_LIMIT)
+        _caches[key] = cache
+    return cache
+
+
+def make_key(*parts):
+    """Build a compact, stable cache key from arbitrary string parts"""
+    joined = "\x00".join(str(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
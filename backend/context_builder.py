@@ -0,0 +1,42 @@
+PREGNANCY_KEYWORDS = ['pregnancy', 'preeclampsia', 'gestational', 'trimester', 'fetal', 'bleeding', 'contractions', 'prenatal']
+
+MAX_CONTEXT_CHARS = 6000
+
+
+def filter_pregnancy_nodes(nodes, max_context_nodes, verbose=True):
+    """Keep pregnancy-related nodes, or all nodes if none of them are"""
+    filtered_nodes = []
+    for node in nodes:
+        node_text = node.get_text().lower()
+        if any(keyword in node_text for keyword in PREGNANCY_KEYWORDS):
+            filtered_nodes.append(node)
+
+    if filtered_nodes:
+        nodes = filtered_nodes[:max_context_nodes]
+        if verbose:
+            print(f"🔍 After pregnancy keyword filtering: {len(nodes)} nodes")
+    elif verbose:
+        print("⚠️ No pregnancy-related content found, using original nodes")
+    return nodes
+
+
+def select_context(nodes, max_context_chars=MAX_CONTEXT_CHARS):
+    """Return (node, text) pairs that fit in max_context_chars, truncating the last one"""
+    selected = []
+    total_chars = 0
+
+    for node in nodes:
+        node_text = node.get_text()
+        if total_chars + len(node_text) <= max_context_chars:
+            selected.append((node, node_text))
+            total_chars += len(node_text)
+        else:
+            remaining_chars = max_context_chars - total_chars
+            if remaining_chars > 100:
+                selected.append((node, node_text[:remaining_chars] + "..."))
+            break
+    return selected
+
+
+def build_context_text(nodes, max_context_chars=MAX_CONTEXT_CHARS):
+    return "\n\n---\n\n".join(text for node, text in select_context(nodes, max_context_chars))
@@ -0,0 +1,254 @@
+import os
+import re
+import csv
+import uuid
+from llama_index.core.schema import TextNode, NodeWithScore
+from backend.dedup import chunk_fingerprint, PROVENANCE_KEYS
+
+
+# Columns whose values are indexed for exact lookup; by default any header naming a symptom
+SYMPTOM_COLUMNS = [c.strip().lower() for c in os.getenv("GRAVILOG_SYMPTOM_COLUMNS", "").split(",") if c.strip()]
+SYMPTOM_COLUMN_PATTERN = re.compile(r"symptom|sign|complaint", re.IGNORECASE)
+# Placeholder cell values that name no symptom and must never match a question
+NON_SYMPTOM_VALUES = {
+    "none", "na", "n a", "nil", "null", "unknown", "other", "not applicable",
+    "not specified", "no symptoms",
+}
+MIN_KEY_LENGTH = 4
+MAX_KEY_WORDS = 8
+
+CSV_ROW_SOURCE_TYPE = "csv_row"
+NODE_NAMESPACE = uuid.UUID("6f1c9e5e-2b1e-4f5a-9a55-6c1f3b0d7a21")
+BOOLEAN_VALUES = {"true": True, "false": False, "yes": True, "no": False}
+# Metadata of a row node that is not a cell of the row
+ROW_METADATA_KEYS = {"file_name", "row_number", "source_type", "symptom_columns", "duplicate_symptoms", *PROVENANCE_KEYS}
+
+
+def normalize_key(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def _parse_int(value):
+    return int(value)
+
+
+def _parse_float(value):
+    return float(value)
+
+
+def _parse_bool(value):
+    return BOOLEAN_VALUES[value.strip().lower()]
+
+
+def infer_column_types(rows, columns):
+    """Narrowest of int, float, bool or str that fits every non-empty value of a column"""
+    types = {}
+    for column in columns:
+        values = [row[column].strip() for row in rows if (row.get(column) or "").strip()]
+        types[column] = "str"
+        if not values:
+            continue
+        for name, parse in (("int", _parse_int), ("float", _parse_float), ("bool", _parse_bool)):
+            try:
+                for value in values:
+                    parse(value)
+            except (ValueError, KeyError):
+                continue
+            types[column] = name
+            break
+    return types
+
+
+def _typed_value(value, column_type):
+    value = value.strip()
+    if column_type == "int":
+        return _parse_int(value)
+    if column_type == "float":
+        return _parse_float(value)
+    if column_type == "bool":
+        return _parse_bool(value)
+    return value
+
+
+def is_symptom_column(column):
+    if SYMPTOM_COLUMNS:
+        return column.strip().lower() in SYMPTOM_COLUMNS
+    return bool(SYMPTOM_COLUMN_PATTERN.search(column))
+
+
+def load_csv_row_nodes(directory):
+    """One TextNode per CSV row, with each non-empty cell as typed metadata"""
+    nodes = []
+    for root, _, files in os.walk(directory):
+        for file_name in sorted(files):
+            if not file_name.lower().endswith(".csv"):
+                continue
+            path = os.path.join(root, file_name)
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                columns = [c for c in (reader.fieldnames or []) if c]
+                rows = list(reader)
+
+            column_types = infer_column_types(rows, columns)
+            symptom_columns = [c for c in columns if is_symptom_column(c)]
+            relative_path = os.path.relpath(path, directory)
+
+            for row_number, row in enumerate(rows, start=1):
+                cells = {c: row[c] for c in columns if (row.get(c) or "").strip()}
+                if not cells:
+                    continue
+                metadata = {c: _typed_value(v, column_types[c]) for c, v in cells.items()}
+                text = "\n".join(f"{c}: {v.strip()}" for c, v in cells.items())
+                node = TextNode(
+                    id_=str(uuid.uuid5(NODE_NAMESPACE, f"{relative_path}:{row_number}")),
+                    text=text,
+                    metadata={
+                        **metadata,
+                        "file_name": file_name,
+                        "row_number": row_number,
+                        "source_type": CSV_ROW_SOURCE_TYPE,
+                        "symptom_columns": symptom_columns,
+                    },
+                )
+                # The cells are already in the text; keep the metadata out of embeddings and prompts
+                node.excluded_embed_metadata_keys = list(node.metadata)
+                node.excluded_llm_metadata_keys = list(node.metadata)
+                nodes.append(node)
+
+    print(f"📑 Loaded {len(nodes)} CSV rows as nodes")
+    return nodes
+
+
+class SymptomIndex:
+    """In-memory inverted index from normalized symptom cell values to CSV row nodes.
+
+    Each cell is one key: cells listing several symptoms are not split, since a
+    fragment like "severe" would match questions about unrelated symptoms.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._nodes = {}
+
+    def __len__(self):
+        return len(self._postings)
+
+    def _add_key(self, key, node_id):
+        if key in NON_SYMPTOM_VALUES or len(key) < MIN_KEY_LENGTH or len(key.split()) > MAX_KEY_WORDS:
+            return
+        postings = self._postings.setdefault(key, [])
+        if node_id not in postings:
+            postings.append(node_id)
+
+    def add(self, node):
+        columns = node.metadata.get("symptom_columns", [])
+        if not columns:
+            return
+        self._nodes[node.node_id] = node
+        values = [node.metadata.get(column) for column in columns]
+        # Symptoms of the duplicate rows merged into this one by collapse_duplicate_rows
+        values.extend(node.metadata.get("duplicate_symptoms", []))
+        for value in values:
+            if isinstance(value, str):
+                self._add_key(normalize_key(value), node.node_id)
+
+    def _rows(self, node_ids):
+        return [NodeWithScore(node=self._nodes[node_id], score=1.0) for node_id in node_ids]
+
+    def lookup(self, key):
+        """Rows whose symptom cell equals key after normalization; empty on a miss"""
+        return self._rows(self._postings.get(normalize_key(key), []))
+
+    def mentions(self, text, limit=None):
+        """Rows whose symptom cell appears as a phrase inside text, longest phrases first.
+
+        A mention says nothing about context ("no headache"), so these rows are only
+        retrieval candidates, never an answer on their own.
+        """
+        tokens = normalize_key(text).split()
+        node_ids = []
+        for length in range(min(MAX_KEY_WORDS, len(tokens)), 0, -1):
+            for start in range(len(tokens) - length + 1):
+                for node_id in self._postings.get(" ".join(tokens[start:start + length]), ()):
+                    if node_id not in node_ids:
+                        node_ids.append(node_id)
+        return self._rows(node_ids[:limit])
+
+
+def row_dedup_key(node):
+    """The row's non-symptom cells, normalized.
+
+    Rows without a real symptom, or without any other cell, are keyed on all of their
+    cells, so they are only merged with identical rows.
+    """
+    symptom_columns = node.metadata.get("symptom_columns", [])
+    cells = {c: normalize_key(str(v)) for c, v in node.metadata.items() if c not in ROW_METADATA_KEYS}
+    other_cells = {c: v for c, v in cells.items() if c not in symptom_columns}
+    has_symptom = any(v not in NON_SYMPTOM_VALUES for c, v in cells.items() if c in symptom_columns)
+    if not has_symptom or not other_cells:
+        other_cells = cells
+    return tuple(sorted(other_cells.items()))
+
+
+def collapse_duplicate_rows(nodes):
+    """Merge CSV rows that only differ in their symptom cells, across all files.
+
+    The first row of each group is kept. Its symptom cells list the distinct values of the
+    group, and the other values are recorded in duplicate_symptoms so that every symptom
+    key still finds it. Dropped rows are recorded like collapse_near_duplicates does.
+    Returns (nodes, report).
+    """
+    groups = {}
+    for node in nodes:
+        groups.setdefault(row_dedup_key(node), []).append(node)
+
+    kept = []
+    removed = 0
+    for canonical, *duplicates in groups.values():
+        kept.append(canonical)
+        if not duplicates:
+            continue
+        removed += len(duplicates)
+
+        merged_values = {}
+        duplicate_symptoms = []
+        for column in canonical.metadata.get("symptom_columns", []):
+            values = []
+            for row in [canonical, *duplicates]:
+                value = row.metadata.get(column)
+                if value is not None and normalize_key(str(value)) not in {normalize_key(str(v)) for v in values}:
+                    values.append(value)
+            merged_values[column] = values
+            duplicate_symptoms.extend(str(v) for v in values if v != canonical.metadata.get(column))
+
+        lines = []
+        for line in canonical.text.split("\n"):
+            column = line.split(": ", 1)[0]
+            if len(merged_values.get(column, ())) > 1:
+                line = f"{column}: {'; '.join(str(v) for v in merged_values[column])}"
+            lines.append(line)
+        canonical.text = "\n".join(lines)
+
+        sources = {row.metadata.get("file_name") for row in [canonical, *duplicates]} - {None}
+        canonical.metadata["duplicate_symptoms"] = duplicate_symptoms
+        canonical.metadata["duplicate_chunks"] = [chunk_fingerprint(row, row.text) for row in duplicates]
+        canonical.metadata["duplicate_sources"] = sorted(sources)
+        for keys in (canonical.excluded_embed_metadata_keys, canonical.excluded_llm_metadata_keys):
+            keys.extend(key for key in ["duplicate_symptoms", *PROVENANCE_KEYS] if key not in keys)
+
+    report = {
+        "input_rows": len(nodes),
+        "output_rows": len(kept),
+        "removed_rows": removed,
+        "row_reduction": removed / len(nodes) if nodes else 0.0,
+    }
+    return kept, report
+
+
+def build_symptom_index(nodes):
+    index = SymptomIndex()
+    for node in nodes:
+        index.add(node)
+    print(f"⚡ Symptom index built with {len(index)} keys")
+    return index
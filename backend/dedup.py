@@ -0,0 +1,137 @@
+import os
+import re
+import hashlib
+import mmh3
+import numpy as np
+
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+# Candidate pairs from LSH are only merged if their shingle sets are at least this similar
+SIMILARITY_THRESHOLD = float(os.getenv("GRAVILOG_DEDUP_THRESHOLD", "0.8"))
+
+MERSENNE_PRIME = (1 << 31) - 1
+PROVENANCE_KEYS = ["duplicate_chunks", "duplicate_sources"]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Word n-grams of the normalized text"""
+    tokens = re.findall(r"\w+", text.lower())
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from one mmh3 hash per shingle and random universal permutations"""
+
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        hashes = np.fromiter(
+            (mmh3.hash(s, signed=False) % MERSENNE_PRIME for s in shingle_set),
+            dtype=np.uint64, count=len(shingle_set),
+        )
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_duplicate_clusters(shingle_sets, threshold=SIMILARITY_THRESHOLD, bands=LSH_BANDS, num_permutations=NUM_PERMUTATIONS):
+    """Group indexes of near-duplicate shingle sets; returns clusters with more than one member.
+
+    Clusters are transitive: A and C share a cluster if A≈B and B≈C, however far apart A and C are.
+    """
+    hasher = MinHasher(num_permutations)
+    signatures = [hasher.signature(s) for s in shingle_sets]
+    rows = num_permutations // bands
+
+    parent = list(range(len(shingle_sets)))
+    checked = set()
+    for band in range(bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            key = signature[band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(i)
+
+        for members in buckets.values():
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if jaccard(shingle_sets[i], shingle_sets[j]) >= threshold:
+                        parent[_find(parent, j)] = _find(parent, i)
+
+    clusters = {}
+    for i in range(len(shingle_sets)):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def chunk_fingerprint(node, text):
+    """Source file plus a hash of the chunk text, which stays valid across rebuilds unlike node ids"""
+    return f"{node.metadata.get('file_name', 'unknown')}#{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+def collapse_near_duplicates(nodes, threshold=SIMILARITY_THRESHOLD):
+    """Merge near-duplicate nodes into one canonical node each.
+
+    The longest node of every cluster is kept. Other members are dropped only if they are
+    near-duplicates of that node itself, and the source files and text hashes of the ones
+    dropped are recorded in its metadata. Returns (nodes, report).
+    """
+    texts = [node.get_content() for node in nodes]
+    shingle_sets = [shingles(text) for text in texts]
+    clusters = find_duplicate_clusters(shingle_sets, threshold=threshold)
+
+    removed = set()
+    merged_clusters = 0
+    for members in clusters:
+        canonical = max(members, key=lambda i: (len(texts[i]), -i))
+        # A member only linked to the canonical node through others may say something different
+        duplicates = [
+            i for i in members
+            if i != canonical and jaccard(shingle_sets[canonical], shingle_sets[i]) >= threshold
+        ]
+        if not duplicates:
+            continue
+
+        merged_clusters += 1
+        node = nodes[canonical]
+        sources = {nodes[i].metadata.get("file_name") for i in [canonical, *duplicates]} - {None}
+        node.metadata["duplicate_chunks"] = [chunk_fingerprint(nodes[i], texts[i]) for i in duplicates]
+        node.metadata["duplicate_sources"] = sorted(sources)
+        for keys in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+            keys.extend(key for key in PROVENANCE_KEYS if key not in keys)
+        removed.update(duplicates)
+
+    kept = [node for i, node in enumerate(nodes) if i not in removed]
+    total_chars = sum(len(text) for text in texts)
+    removed_chars = sum(len(texts[i]) for i in removed)
+    report = {
+        "input_nodes": len(nodes),
+        "output_nodes": len(kept),
+        "clusters": merged_clusters,
+        "removed_nodes": len(removed),
+        "removed_chars": removed_chars,
+        "node_reduction": len(removed) / len(nodes) if nodes else 0.0,
+        "char_reduction": removed_chars / total_chars if total_chars else 0.0,
+    }
+    return kept, report
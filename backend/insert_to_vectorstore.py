@@ -1,10 +1,11 @@
 from backend.utils import rebuild_index
 
 # This will:
-# 1. Delete all old vectors from Pinecone
-# 2. Clear local storage
-# 3. Process your CSVs with the new CSV reader
-# 4. Rebuild and store everything fresh
+# 1. Process your knowledge base (CSV rows and documents)
+# 2. Build the index into a new ./storage-builds/<build> dir and Pinecone namespace
+# 3. Make that build the live one in ./storage.current.json
+# 4. Delete the build before the previous one
+# Running servers keep serving their build until they reload
 index = rebuild_index()
 
 if index:
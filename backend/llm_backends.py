@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from backend.utils import llm as remote_llm
+
+
+# Backend specs: "stub", "ollama:<model>", "huggingface:<model>"; empty disables the local backend
+LOCAL_LLM_SPEC = os.getenv("GRAVILOG_LOCAL_LLM", "")
+# Risk-assessment prompts up to this size go to the local model first; anything else
+# (follow-up answers, oversized prompts) goes to the remote model first
+LOCAL_MAX_PROMPT_CHARS = int(os.getenv("GRAVILOG_LOCAL_MAX_PROMPT_CHARS", "8000"))
+
+TASK_RISK_ASSESSMENT = "risk_assessment"
+TASK_FOLLOW_UP = "follow_up"
+
+
+class LLMBackend:
+    """A named llama_index LLM with latency and error accounting"""
+
+    def __init__(self, name, llm):
+        self.name = name
+        self.llm = llm
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _record(self, seconds, failed):
+        with self._lock:
+            self._calls += 1
+            self._errors += 1 if failed else 0
+            self._total_seconds += seconds
+            self._max_seconds = max(self._max_seconds, seconds)
+
+    def complete(self, prompt):
+        start = time.perf_counter()
+        try:
+            response = str(self.llm.complete(prompt))
+        except Exception:
+            self._record(time.perf_counter() - start, failed=True)
+            raise
+        self._record(time.perf_counter() - start, failed=False)
+        return response
+
+    def stream_complete(self, prompt):
+        start = time.perf_counter()
+        try:
+            for chunk in self.llm.stream_complete(prompt):
+                if chunk.delta:
+                    yield chunk.delta
+        except Exception:
+            self._record(time.perf_counter() - start, failed=True)
+            raise
+        self._record(time.perf_counter() - start, failed=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "errors": self._errors,
+                "mean_seconds": self._total_seconds / self._calls if self._calls else 0.0,
+                "max_seconds": self._max_seconds,
+            }
+
+
+def create_local_backend(spec):
+    """Build the local backend described by spec, or None if spec is empty"""
+    if not spec:
+        return None
+
+    kind, _, model = spec.partition(":")
+    if kind == "stub":
+        from backend.stub_llm import StubLLM
+        return LLMBackend("local-stub", StubLLM())
+    if kind == "ollama":
+        from llama_index.llms.ollama import Ollama
+        return LLMBackend(f"ollama:{model}", Ollama(
+            model=model,
+            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+            request_timeout=60.0,
+            temperature=0.1,
+        ))
+    if kind == "huggingface":
+        from llama_index.llms.huggingface import HuggingFaceLLM
+        return LLMBackend(f"huggingface:{model}", HuggingFaceLLM(
+            model_name=model,
+            tokenizer_name=model,
+            max_new_tokens=500,
+            generate_kwargs={"temperature": 0.1, "do_sample": True},
+        ))
+    raise ValueError(f"Unknown local LLM backend: {spec}")
+
+
+class LLMRouter:
+    """Routes prompts between a local and a remote backend, failing over to the other"""
+
+    def __init__(self, remote, local=None, local_max_prompt_chars=LOCAL_MAX_PROMPT_CHARS):
+        self.remote = remote
+        self.local = local
+        self.local_max_prompt_chars = local_max_prompt_chars
+
+    def route(self, prompt, task):
+        """Backends to try, in order"""
+        if self.local is None:
+            return [self.remote]
+        if task == TASK_RISK_ASSESSMENT and len(prompt) <= self.local_max_prompt_chars:
+            return [self.local, self.remote]
+        return [self.remote, self.local]
+
+    def complete(self, prompt, task=TASK_FOLLOW_UP):
+        """Return (response, name of the backend that produced it)"""
+        last_error = None
+        for backend in self.route(prompt, task):
+            try:
+                return backend.complete(prompt), backend.name
+            except Exception as e:
+                print(f"⚠️ LLM backend {backend.name} failed: {e}")
+                last_error = e
+        raise last_error
+
+    def stream_complete(self, prompt, task=TASK_FOLLOW_UP, on_start=None):
+        """Stream from the first backend that produces output; fails over only before any text is sent.
+
+        on_start is called with the name of that backend before its first delta is yielded.
+        """
+        last_error = None
+        for backend in self.route(prompt, task):
+            started = False
+            try:
+                for delta in backend.stream_complete(prompt):
+                    if not started and on_start is not None:
+                        on_start(backend.name)
+                    started = True
+                    yield delta
+                return
+            except Exception as e:
+                if started:
+                    raise
+                print(f"⚠️ LLM backend {backend.name} failed: {e}")
+                last_error = e
+        raise last_error
+
+    def stats(self):
+        backends = [self.remote] + ([self.local] if self.local is not None else [])
+        return {backend.name: backend.stats() for backend in backends}
+
+
+router = LLMRouter(
+    remote=LLMBackend(remote_llm.metadata.model_name, remote_llm),
+    local=create_local_backend(LOCAL_LLM_SPEC),
+)
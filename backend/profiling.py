@@ -0,0 +1,201 @@
+"""On-demand profiling of live requests.
+
+Profiling is switched on at runtime, either for a random fraction of requests or for
+specific sessions, through the shared cache so every worker process sees the same
+settings (see the /debug/profiling routes in backend/api.py). Profiles go to
+GRAVILOG_PROFILE_DIR, keeping only the newest GRAVILOG_PROFILE_MAX_FILES files:
+
+- "sample" mode writes collapsed stacks (.folded) for flamegraph.pl or speedscope
+- "cprofile" mode writes cProfile stats (.prof) for snakeviz or flameprof
+"""
+import os
+import sys
+import time
+import random
+import inspect
+import cProfile
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from backend.cache import get_cache
+
+
+PROFILE_DIR = os.getenv("GRAVILOG_PROFILE_DIR", "./profiles")
+PROFILE_MODE = os.getenv("GRAVILOG_PROFILE_MODE", "sample")
+PROFILE_INTERVAL = float(os.getenv("GRAVILOG_PROFILE_INTERVAL", "0.005"))
+PROFILE_MAX_FILES = int(os.getenv("GRAVILOG_PROFILE_MAX_FILES", "200"))
+DEFAULT_SAMPLE_RATE = float(os.getenv("GRAVILOG_PROFILE_RATE", "0"))
+DEFAULT_SESSION_TTL = int(os.getenv("GRAVILOG_PROFILE_SESSION_TTL", "3600"))
+
+SAMPLE_RATE_KEY = "sample_rate"
+_EXHAUSTED = object()
+SESSION_KEY_PREFIX = "session:"
+
+
+def get_sample_rate():
+    return get_cache("profiling").get(SAMPLE_RATE_KEY, DEFAULT_SAMPLE_RATE)
+
+
+def set_sample_rate(rate):
+    get_cache("profiling").set(SAMPLE_RATE_KEY, min(max(float(rate), 0.0), 1.0))
+
+
+def enable_session(session_id, ttl=DEFAULT_SESSION_TTL):
+    get_cache("profiling").set(SESSION_KEY_PREFIX + session_id, True, expire=ttl)
+
+
+def disable_session(session_id):
+    get_cache("profiling").delete(SESSION_KEY_PREFIX + session_id)
+
+
+def profiled_sessions():
+    cache = get_cache("profiling")
+    return sorted(
+        key[len(SESSION_KEY_PREFIX):] for key in cache.iterkeys()
+        if isinstance(key, str) and key.startswith(SESSION_KEY_PREFIX) and cache.get(key)
+    )
+
+
+def should_profile(session_id):
+    if session_id and get_cache("profiling").get(SESSION_KEY_PREFIX + session_id):
+        return True
+    rate = get_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts the collapsed stacks"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gravilog-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def enforce_retention(directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+    """Delete the oldest profiles beyond max_files"""
+    try:
+        entries = [os.path.join(directory, name) for name in os.listdir(directory)]
+    except FileNotFoundError:
+        return
+    entries = sorted((p for p in entries if os.path.isfile(p)), key=os.path.getmtime)
+    for path in entries[:max(len(entries) - max_files, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def start_profiler():
+    """Start the configured profiler on the calling thread.
+
+    Returns a function that stops it and writes the profile to <stem>.prof or <stem>.folded.
+    """
+    if PROFILE_MODE == "cprofile":
+        profiler = cProfile.Profile()
+        # Raises ValueError on Python >= 3.12 if another request is already being profiled
+        profiler.enable()
+
+        def finish(stem):
+            profiler.disable()
+            path = os.path.join(PROFILE_DIR, stem + ".prof")
+            profiler.dump_stats(path)
+            return path
+        return finish
+
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+
+    def finish(stem):
+        sampler.stop()
+        path = os.path.join(PROFILE_DIR, stem + ".folded")
+        sampler.write(path)
+        return path
+    return finish
+
+
+@contextmanager
+def profile_request(session_id, label):
+    """Profile the enclosed block if profiling is on for this session or this request is sampled.
+
+    Profiling problems (cache errors, a full disk, a profiler already running) are logged
+    and never fail the request itself.
+    """
+    finish = None
+    try:
+        if should_profile(session_id):
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            finish = start_profiler()
+    except Exception as e:
+        print(f"⚠️ Not profiling {label}: {e}")
+        finish = None
+
+    if finish is None:
+        yield
+        return
+
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{(session_id or 'anon')[:12]}-{label}"
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        try:
+            path = finish(stem)
+            print(f"🔬 Profiled {label} in {time.perf_counter() - start:.2f}s -> {path}")
+            enforce_retention()
+        except Exception as e:
+            print(f"⚠️ Could not save the profile of {label}: {e}")
+
+
+def profiled(label):
+    """Method decorator: profile calls using the instance's session_id.
+
+    Generator methods are profiled up to their first yield, which covers retrieval and
+    everything else before a streamed answer starts; Gradio may run the later steps,
+    which wait on the LLM, on other threads.
+    """
+    def decorator(method):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(self, *args, **kwargs):
+                steps = method(self, *args, **kwargs)
+                with profile_request(getattr(self, "session_id", None), label):
+                    first = next(steps, _EXHAUSTED)
+                if first is not _EXHAUSTED:
+                    yield first
+                    yield from steps
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with profile_request(getattr(self, "session_id", None), label):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
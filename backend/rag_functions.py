@@ -1,160 +1,224 @@
 import os
+import time
+import threading
 import requests
-from backend.utils import get_and_chunk_documents, llm, embed_model, get_index
+from backend.utils import get_and_chunk_documents, llm, embed_model, get_index, get_current_build, RERANK_MODEL
 from backend.utils import Settings 
-from llama_index.retrievers.bm25 import BM25Retriever
+from backend.cache import get_cache, make_key
+from backend.adaptive_retrieval import adaptive_retrieve, adaptive_rerank, VECTOR_LEG, BM25_LEG
+from backend.retrieval_context import RetrievalContextHolder, build_retrieval_context, FUSION_TOP_K
+from backend.llm_backends import router as llm_router, TASK_RISK_ASSESSMENT, TASK_FOLLOW_UP
+from backend.context_builder import filter_pregnancy_nodes, build_context_text, MAX_CONTEXT_CHARS
 from llama_index.core.postprocessor import SentenceTransformerRerank
 from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.response_synthesizers import get_response_synthesizer
 from llama_index.core.settings import Settings
 from llama_index.core import VectorStoreIndex
 from llama_index.core.llms import ChatMessage
-from llama_index.core.retrievers import QueryFusionRetriever
 import json
 
 
 Settings.llm = llm
 Settings.embed_model = embed_model
 
+LLM_CACHE_TTL = int(os.getenv("GRAVILOG_LLM_CACHE_TTL", "86400"))
+# How often each serving process checks the shared cache for reload requests
+RELOAD_POLL_SECONDS = float(os.getenv("GRAVILOG_RELOAD_POLL_SECONDS", "2"))
+RELOAD_GENERATION_KEY = "retrieval_reload_generation"
 
-index = get_index()
-hybrid_retriever = None
-vector_retriever = None
-bm25_retriever = None
+# Start from a small fused pool, widen it only when fusion scores are flat, and skip or
+# shorten cross-encoder reranking when the fused ranking is already decisive
+ADAPTIVE_RETRIEVAL = os.getenv("GRAVILOG_ADAPTIVE_RETRIEVAL", "0") == "1"
 
-if index:
-    try:
-        
-        vector_retriever = index.as_retriever(similarity_top_k=15)
-        print("✅ Vector retriever initialized successfully")
-        
-        
-        all_nodes = index.docstore.docs
-        if len(all_nodes) == 0:
-            print("⚠️ Warning: No documents found in index, skipping BM25 retriever")
-            hybrid_retriever = vector_retriever  
-        else:
-            
-            has_text_content = False
-            for node_id, node in all_nodes.items():
-                if hasattr(node, 'text') and node.text and node.text.strip():
-                    has_text_content = True
-                    break
-            
-            if not has_text_content:
-                print("⚠️ Warning: No text content found in documents, skipping BM25 retriever")
-                hybrid_retriever = vector_retriever  
-            else:
-                try:
-                    
-                    print("🔄 Creating BM25 retriever...")
-                    bm25_retriever = BM25Retriever.from_defaults(
-                        docstore=index.docstore, 
-                        similarity_top_k=15,
-                        verbose=False
-                    )
-                    print("✅ BM25 retriever initialized successfully")
-                    
-                    
-                    hybrid_retriever = QueryFusionRetriever(
-                        retrievers=[vector_retriever, bm25_retriever],
-                        similarity_top_k=20,
-                        num_queries=1,  
-                        mode="reciprocal_rerank",  
-                        use_async=False,
-                    )
-                    print("✅ Hybrid retriever initialized successfully")
-                    
-                except Exception as e:
-                    print(f"❌ Warning: Could not initialize BM25 retriever: {e}")
-                    print("🔄 Falling back to vector-only retrieval")
-                    hybrid_retriever = vector_retriever
-        
-    except Exception as e:
-        print(f"❌ Warning: Could not initialize retrievers: {e}")
-        hybrid_retriever = None
-        vector_retriever = None
-        bm25_retriever = None
-else:
-    print("❌ Warning: Could not initialize retrievers - index is None")
-
-def call_groq_api(prompt):
-    """Call Groq API instead of LM Studio"""
+# Loaded once at import so a pre-forking server shares the weights with every worker.
+# top_n covers the whole fused candidate set; callers slice down to what they need.
+reranker = SentenceTransformerRerank(model=RERANK_MODEL, top_n=FUSION_TOP_K)
+query_engine_reranker = SentenceTransformerRerank(model=RERANK_MODEL, top_n=5)
+
+# Retrievers are versioned so that a rebuilt index can be swapped in without a restart
+_startup_build = get_current_build()
+retrieval_contexts = RetrievalContextHolder(
+    build_retrieval_context(get_index(_startup_build), version=1, build=_startup_build)
+)
+
+def reload_retrieval_context():
+    """Rebuild the retrievers from the live build in the background and swap them in atomically"""
+    build = get_current_build()
+    return retrieval_contexts.reload_in_background(lambda: get_index(build), build=build)
+
+
+def get_reload_generation():
+    return get_cache("admin").get(RELOAD_GENERATION_KEY, 0)
+
+
+def request_reload():
+    """Ask every process serving from this cache directory to reload its retrievers"""
+    return get_cache("admin").incr(RELOAD_GENERATION_KEY)
+
+
+_reload_watcher_pid = None
+
+def start_reload_watcher(interval=RELOAD_POLL_SECONDS):
+    """Reload this process's retrievers whenever request_reload() is called in any process.
+
+    Also reloads right away if the process starts out on a build that is no longer live,
+    as a worker re-forked from the serve.py supervisor does after a rebuild: the
+    supervisor still holds the build it loaded at startup, which a later rebuild deletes.
+    Threads do not survive a fork, so this must be called in each serving process.
+    """
+    global _reload_watcher_pid
+    if _reload_watcher_pid == os.getpid():
+        return
+    _reload_watcher_pid = os.getpid()
+
+    def watch():
+        seen = get_reload_generation()
+        stale = retrieval_contexts.current.build_id != get_current_build()["build_id"]
+        if stale:
+            print(f"🔄 Build {retrieval_contexts.current.build_id or 'storage'} is no longer live, reloading")
+        while True:
+            try:
+                generation = get_reload_generation()
+                # A reload that is already running is retried on the next poll
+                if (stale or generation != seen) and reload_retrieval_context():
+                    seen = generation
+                    stale = False
+            except Exception as e:
+                print(f"⚠️ Could not check for reload requests: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=watch, name="gravilog-reload-watcher", daemon=True).start()
+
+
+def call_llm(prompt, task=TASK_FOLLOW_UP):
+    """Complete a prompt on the backend the LLM router picks for this task, with failover"""
+    # A TTL of 0 disables the cache (e.g. for load tests that need every call to hit the LLM)
+    cache = get_cache("llm") if LLM_CACHE_TTL > 0 else None
+    # Keyed on the backend the router tries first, so switching backends never serves
+    # another model's answers
+    primary_backend = llm_router.route(prompt, task)[0].name
+    cache_key = make_key(primary_backend, prompt)
+    cached = cache.get(cache_key) if cache is not None else None
+    if cached is not None:
+        print("♻️ Using cached LLM response")
+        return cached
+    
     try:
         
-        response = Settings.llm.complete(prompt)
-        return str(response)
+        response_text, backend_name = llm_router.complete(prompt, task=task)
+        # Failover answers are not cached, so the primary backend takes over again once it recovers
+        if cache is not None and backend_name == primary_backend:
+            cache.set(cache_key, response_text, expire=LLM_CACHE_TTL)
+        return response_text
     except Exception as e:
-        print(f"❌ Groq API call failed: {e}")
+        print(f"❌ LLM call failed on every backend: {e}")
         raise e
 
-def get_direct_answer(question, symptom_summary, conversation_context="", max_context_nodes=8, is_risk_assessment=True):
-    """Get answer using hybrid retriever with retrieved context"""
-    
-    print(f"🎯 Processing question: {question}")
+
+def stream_llm(prompt, task=TASK_FOLLOW_UP):
+    """Like call_llm, but yields the response in pieces as the LLM generates it"""
+    cache = get_cache("llm") if LLM_CACHE_TTL > 0 else None
+    primary_backend = llm_router.route(prompt, task)[0].name
+    cache_key = make_key(primary_backend, prompt)
+    cached = cache.get(cache_key) if cache is not None else None
+    if cached is not None:
+        print("♻️ Using cached LLM response")
+        yield cached
+        return
+
+    backends = []
+    response_text = ""
+    for delta in llm_router.stream_complete(prompt, task=task, on_start=backends.append):
+        response_text += delta
+        yield delta
+    if cache is not None and backends == [primary_backend]:
+        cache.set(cache_key, response_text, expire=LLM_CACHE_TTL)
+
+
+def retrieve_and_rerank(context, question, max_context_nodes, candidates=()):
+    """Hybrid retrieval and cross-encoder reranking for a question.
+
+    candidates (e.g. symptom rows mentioned in the question) join the retrieved nodes
+    before reranking. Returns (nodes, None), or (None, message) when nothing could be retrieved.
+    """
     
-    if not hybrid_retriever:
-        return "Error: Retriever not available. Please check if documents are properly loaded in the index."
+    if not context.hybrid_retriever:
+        return None, "Error: Retriever not available. Please check if documents are properly loaded in the index."
     
     try:
         
         print("🔍 Retrieving with available retrieval method...")
-        retrieved_nodes = hybrid_retriever.retrieve(question)
+        contenders = None
+        if ADAPTIVE_RETRIEVAL:
+            legs = [
+                (leg, retriever)
+                for leg, retriever in ((VECTOR_LEG, context.vector_retriever), (BM25_LEG, context.bm25_retriever))
+                if retriever is not None
+            ]
+            retrieved_nodes, contenders = adaptive_retrieve(question, legs, FUSION_TOP_K)
+        else:
+            retrieved_nodes = context.hybrid_retriever.retrieve(question)
         print(f"📊 Retrieved {len(retrieved_nodes)} nodes")
         
     except Exception as e:
         print(f"❌ Retrieval failed: {e}")
-        return f"Error during document retrieval: {e}. Please check your document index."
+        return None, f"Error during document retrieval: {e}. Please check your document index."
+    
+    retrieved_ids = {node.node.node_id for node in retrieved_nodes}
+    extra_nodes = [node for node in candidates if node.node.node_id not in retrieved_ids]
+    retrieved_nodes = retrieved_nodes + extra_nodes
     
     if not retrieved_nodes:
-        return "No relevant documents found for this question. Please ensure your medical knowledge base is properly loaded and consult your healthcare provider for medical advice."
+        return None, "No relevant documents found for this question. Please ensure your medical knowledge base is properly loaded and consult your healthcare provider for medical advice."
     
     
     try:
-        reranker = SentenceTransformerRerank(
-            model='cross-encoder/ms-marco-MiniLM-L-2-v2',
-            top_n=max_context_nodes,
-        )
-        
-        reranked_nodes = reranker.postprocess_nodes(retrieved_nodes, query_str=question)
+        # Extra candidates have no leg scores, so the adaptive early exit cannot judge them
+        if ADAPTIVE_RETRIEVAL and not extra_nodes:
+            reranked_nodes = adaptive_rerank(question, retrieved_nodes, contenders, reranker, RERANK_MODEL, max_context_nodes)
+        else:
+            reranked_nodes = reranker.postprocess_nodes(retrieved_nodes, query_str=question)[:max_context_nodes]
         print(f"🎯 After reranking: {len(reranked_nodes)} nodes")
         
     except Exception as e:
         print(f"❌ Reranking failed: {e}, using original nodes")
         reranked_nodes = retrieved_nodes[:max_context_nodes]
+
+    return reranked_nodes, None
+
+
+def build_answer_prompt(context, question, symptom_summary, conversation_context="", max_context_nodes=8, is_risk_assessment=True, symptom=None):
+    """Retrieve context for a question from a RetrievalContext and build the LLM prompt.
+
+    symptom is an explicit symptom key to look up in the knowledge base tables.
+    Returns (prompt, None), or (None, message) when there is nothing to send to the LLM.
+    """
     
+    print(f"🎯 Processing question: {question}")
     
-    filtered_nodes = []
-    pregnancy_keywords = ['pregnancy', 'preeclampsia', 'gestational', 'trimester', 'fetal', 'bleeding', 'contractions', 'prenatal']
-    
-    for node in reranked_nodes:
-        node_text = node.get_text().lower()
-        if any(keyword in node_text for keyword in pregnancy_keywords):
-            filtered_nodes.append(node)
-    
-    if filtered_nodes:
-        reranked_nodes = filtered_nodes[:max_context_nodes]
-        print(f"🔍 After pregnancy keyword filtering: {len(reranked_nodes)} nodes")
+    reranked_nodes = []
+    candidates = []
+    if not is_risk_assessment and context.symptom_index is not None:
+        # Only an explicit key or a question that is nothing but a symptom skips retrieval;
+        # symptoms mentioned inside a question may be negated or beside the point
+        reranked_nodes = context.symptom_index.lookup(symptom or question)[:max_context_nodes]
+        if not reranked_nodes:
+            candidates = context.symptom_index.mentions(question, limit=max_context_nodes)
+
+    if reranked_nodes:
+        print(f"⚡ Symptom index hit: {len(reranked_nodes)} rows, skipping hybrid retrieval")
     else:
-        print("⚠️ No pregnancy-related content found, using original nodes")
+        if candidates:
+            print(f"⚡ Adding {len(candidates)} symptom rows mentioned in the question to the candidates")
+        reranked_nodes, error_message = retrieve_and_rerank(context, question, max_context_nodes, candidates=candidates)
+        if error_message:
+            return None, error_message
     
     
-    context_chunks = []
-    total_chars = 0
-    max_context_chars = 6000  
+    reranked_nodes = filter_pregnancy_nodes(reranked_nodes, max_context_nodes)
     
-    for node in reranked_nodes:
-        node_text = node.get_text()
-        if total_chars + len(node_text) <= max_context_chars:
-            context_chunks.append(node_text)
-            total_chars += len(node_text)
-        else:
-            remaining_chars = max_context_chars - total_chars
-            if remaining_chars > 100:
-                context_chunks.append(node_text[:remaining_chars] + "...")
-            break
     
-    context_text = "\n\n---\n\n".join(context_chunks)
+    context_text = build_context_text(reranked_nodes, MAX_CONTEXT_CHARS)
     
     
     if is_risk_assessment:
@@ -192,9 +256,22 @@ def get_direct_answer(question, symptom_summary, conversation_context="", max_co
 
     Provide a clear, informative answer based on the medical knowledge. Always mention if symptoms require medical attention and provide risk level (Low/Medium/High) when relevant."""
     
+    return prompt, None
+
+def get_direct_answer(question, symptom_summary, conversation_context="", max_context_nodes=8, is_risk_assessment=True, symptom=None):
+    """Get answer using hybrid retriever with retrieved context"""
+    
+    with retrieval_contexts.acquire() as context:
+        prompt, early_response = build_answer_prompt(
+            context, question, symptom_summary, conversation_context=conversation_context,
+            max_context_nodes=max_context_nodes, is_risk_assessment=is_risk_assessment, symptom=symptom
+        )
+    if prompt is None:
+        return early_response
+    
     try:
-        print("🤖 Generating response with Groq API...")
-        response_text = call_groq_api(prompt)
+        print("🤖 Generating response...")
+        response_text = call_llm(prompt, task=TASK_RISK_ASSESSMENT if is_risk_assessment else TASK_FOLLOW_UP)
         return response_text
         
     except Exception as e:
@@ -203,38 +280,55 @@ def get_direct_answer(question, symptom_summary, conversation_context="", max_co
         traceback.print_exc()
         return f"Error generating response: {e}"
 
+def stream_direct_answer(question, symptom_summary, conversation_context="", max_context_nodes=8, is_risk_assessment=True, symptom=None):
+    """Like get_direct_answer, but yields the response text in pieces as the LLM generates it"""
+    
+    with retrieval_contexts.acquire() as context:
+        prompt, early_response = build_answer_prompt(
+            context, question, symptom_summary, conversation_context=conversation_context,
+            max_context_nodes=max_context_nodes, is_risk_assessment=is_risk_assessment, symptom=symptom
+        )
+    if prompt is None:
+        yield early_response
+        return
+    
+    try:
+        print("🤖 Streaming response...")
+        task = TASK_RISK_ASSESSMENT if is_risk_assessment else TASK_FOLLOW_UP
+        for delta in stream_llm(prompt, task=task):
+            yield delta
+    except Exception as e:
+        print(f"❌ LLM streaming failed: {e}")
+        yield f"Error generating response: {e}"
+
 def get_answer_with_query_engine(question):
     """Alternative approach using LlamaIndex query engine with hybrid retrieval"""
     try:
         print(f"🎯 Processing question with query engine: {question}")
         
-        if index is None:
-            return "Error: Could not load index"
-        
-        
-        if hybrid_retriever:
-            query_engine = RetrieverQueryEngine.from_args(
-                retriever=hybrid_retriever,
-                response_synthesizer=get_response_synthesizer(
-                    response_mode="compact",
-                    use_async=False
-                ),
-                node_postprocessors=[
-                    SentenceTransformerRerank(
-                        model='cross-encoder/ms-marco-MiniLM-L-2-v2',
-                        top_n=5
-                    )
-                ]
-            )
-        else:
+        with retrieval_contexts.acquire() as context:
+            if context.index is None:
+                return "Error: Could not load index"
             
-            query_engine = index.as_query_engine(
-                similarity_top_k=10,
-                response_mode="compact"
-            )
-        
-        print("🤖 Querying with engine...")
-        response = query_engine.query(question)
+            
+            if context.hybrid_retriever:
+                query_engine = RetrieverQueryEngine.from_args(
+                    retriever=context.hybrid_retriever,
+                    response_synthesizer=get_response_synthesizer(
+                        response_mode="compact",
+                        use_async=False
+                    ),
+                    node_postprocessors=[query_engine_reranker]
+                )
+            else:
+                
+                query_engine = context.index.as_query_engine(
+                    similarity_top_k=10,
+                    response_mode="compact"
+                )
+            
+            print("🤖 Querying with engine...")
+            response = query_engine.query(question)
         
         return str(response)
         
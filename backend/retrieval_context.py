@@ -0,0 +1,253 @@
+import threading
+import time
+from contextlib import contextmanager
+from llama_index.retrievers.bm25 import BM25Retriever
+from llama_index.core.retrievers import QueryFusionRetriever
+from backend.sqlite_docstore import SQLiteDocumentStore
+from backend.bm25_index import DocstoreBM25Retriever
+from backend.csv_rows import build_symptom_index, CSV_ROW_SOURCE_TYPE
+from backend.utils import CSV_ROW_NODES
+
+
+VECTOR_TOP_K = 15
+BM25_TOP_K = 15
+FUSION_TOP_K = 20
+
+WARMUP_QUERY = "pregnancy bleeding headache"
+DRAIN_TIMEOUT_SECONDS = 120
+
+
+class RetrievalContext:
+    """One version of the index and the retrievers built on top of it"""
+
+    def __init__(self, version, index=None, vector_retriever=None, bm25_retriever=None, hybrid_retriever=None,
+                 symptom_index=None, build_id=""):
+        self.version = version
+        self.build_id = build_id
+        self.index = index
+        self.vector_retriever = vector_retriever
+        self.bm25_retriever = bm25_retriever
+        self.hybrid_retriever = hybrid_retriever
+        self.symptom_index = symptom_index
+        self.created_at = time.time()
+
+
+def get_corpus_stats(docstore):
+    """Return (node count, whether any node has text) without loading the corpus when possible"""
+    if isinstance(docstore, SQLiteDocumentStore):
+        stats = docstore.corpus_stats()
+        return stats["doc_count"], stats["text_doc_count"] > 0
+
+    all_nodes = docstore.docs
+    has_text_content = False
+    for node_id, node in all_nodes.items():
+        if hasattr(node, 'text') and node.text and node.text.strip():
+            has_text_content = True
+            break
+    return len(all_nodes), has_text_content
+
+
+def get_csv_row_nodes(docstore):
+    """The CSV row nodes stored in the index, filtered in SQL when the docstore allows it"""
+    if isinstance(docstore, SQLiteDocumentStore):
+        return docstore.find_nodes("source_type", CSV_ROW_SOURCE_TYPE)
+    return [node for node in docstore.docs.values() if node.metadata.get("source_type") == CSV_ROW_SOURCE_TYPE]
+
+
+def load_symptom_index(index):
+    """Exact-lookup index over the CSV rows of this index, or None if it has none.
+
+    Built from the index's own docstore, so it always matches the rows being retrieved,
+    even if the CSVs on disk have changed since the index was built.
+    """
+    try:
+        nodes = get_csv_row_nodes(index.docstore)
+    except Exception as e:
+        print(f"❌ Warning: Could not build symptom index: {e}")
+        return None
+    if not nodes:
+        if CSV_ROW_NODES:
+            print("⚠️ Warning: No CSV rows in the index docstore, exact symptom lookup is off. "
+                  "Rebuild the index with insert_to_vectorstore.py")
+        return None
+    symptom_index = build_symptom_index(nodes)
+    if not len(symptom_index):
+        print(f"⚠️ Warning: None of the {len(nodes)} CSV rows has a symptom column, exact symptom lookup is off")
+    return symptom_index
+
+
+def load_bm25_retriever(index, persist_dir):
+    """The build's saved BM25 index, or one built in memory from the whole docstore if it has none"""
+    if persist_dir:
+        bm25_retriever = DocstoreBM25Retriever.from_persist_dir(
+            persist_dir, index.docstore, similarity_top_k=BM25_TOP_K
+        )
+        if bm25_retriever is not None:
+            return bm25_retriever
+    print("⚠️ Warning: No saved BM25 index in this build, indexing the whole docstore in memory. "
+          "Rebuild the index with insert_to_vectorstore.py")
+    return BM25Retriever.from_defaults(
+        docstore=index.docstore,
+        similarity_top_k=BM25_TOP_K,
+        verbose=False
+    )
+
+
+def build_retrieval_context(index, version, build=None):
+    """Build the vector, BM25 and hybrid retrievers for an index, degrading to what is available.
+
+    build is the {"build_id", "persist_dir"} the index was loaded from.
+    """
+    build = build or {}
+    context = RetrievalContext(version, index=index, build_id=build.get("build_id", ""))
+    if not index:
+        print("❌ Warning: Could not initialize retrievers - index is None")
+        return context
+
+    context.symptom_index = load_symptom_index(index)
+
+    try:
+
+        context.vector_retriever = index.as_retriever(similarity_top_k=VECTOR_TOP_K)
+        print("✅ Vector retriever initialized successfully")
+
+
+        document_count, has_text_content = get_corpus_stats(index.docstore)
+        if document_count == 0:
+            print("⚠️ Warning: No documents found in index, skipping BM25 retriever")
+            context.hybrid_retriever = context.vector_retriever
+        elif not has_text_content:
+            print("⚠️ Warning: No text content found in documents, skipping BM25 retriever")
+            context.hybrid_retriever = context.vector_retriever
+        else:
+            try:
+
+                print("🔄 Creating BM25 retriever...")
+                context.bm25_retriever = load_bm25_retriever(index, build.get("persist_dir"))
+                print("✅ BM25 retriever initialized successfully")
+
+
+                context.hybrid_retriever = QueryFusionRetriever(
+                    retrievers=[context.vector_retriever, context.bm25_retriever],
+                    similarity_top_k=FUSION_TOP_K,
+                    num_queries=1,
+                    mode="reciprocal_rerank",
+                    use_async=False,
+                )
+                print("✅ Hybrid retriever initialized successfully")
+
+            except Exception as e:
+                print(f"❌ Warning: Could not initialize BM25 retriever: {e}")
+                print("🔄 Falling back to vector-only retrieval")
+                context.hybrid_retriever = context.vector_retriever
+
+    except Exception as e:
+        print(f"❌ Warning: Could not initialize retrievers: {e}")
+        context.vector_retriever = None
+        context.bm25_retriever = None
+        context.hybrid_retriever = None
+    return context
+
+
+class RetrievalContextHolder:
+    """Holds the live RetrievalContext and swaps in rebuilt ones between requests.
+
+    Requests pin a version with acquire() for as long as they retrieve from it. A swap
+    only changes which version new requests get; the old one is released once the
+    requests still using it have finished.
+    """
+
+    def __init__(self, context):
+        self._condition = threading.Condition()
+        self._current = context
+        self._in_flight = {context.version: 0}
+        self._reload_thread = None
+        self.last_reload_error = None
+
+    @property
+    def current(self):
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        with self._condition:
+            context = self._current
+            self._in_flight[context.version] = self._in_flight.get(context.version, 0) + 1
+        try:
+            yield context
+        finally:
+            with self._condition:
+                self._in_flight[context.version] -= 1
+                if self._in_flight[context.version] == 0 and context is not self._current:
+                    del self._in_flight[context.version]
+                self._condition.notify_all()
+
+    def swap(self, context, drain_timeout=DRAIN_TIMEOUT_SECONDS):
+        """Make context live, then wait for requests on the previous version to finish"""
+        with self._condition:
+            previous = self._current
+            self._current = context
+            self._in_flight.setdefault(context.version, 0)
+            if self._in_flight.get(previous.version) == 0:
+                del self._in_flight[previous.version]
+            print(f"🔁 Retrieval context v{previous.version} -> v{context.version}")
+
+            drained = self._condition.wait_for(
+                lambda: previous.version not in self._in_flight, timeout=drain_timeout
+            )
+        if drained:
+            print(f"✅ Retrieval context v{previous.version} drained")
+        else:
+            print(f"⚠️ Retrieval context v{previous.version} still in use after {drain_timeout}s")
+        return previous
+
+    def is_reloading(self):
+        return self._reload_thread is not None and self._reload_thread.is_alive()
+
+    def reload_in_background(self, load_index, build=None):
+        """Build a new context from load_index() off the request path and swap it in.
+
+        Returns False if a reload is already running.
+        """
+        with self._condition:
+            if self.is_reloading():
+                return False
+            self._reload_thread = threading.Thread(
+                target=self._reload, args=(load_index, build), name="gravilog-reload", daemon=True
+            )
+            self._reload_thread.start()
+        return True
+
+    def _reload(self, load_index, build):
+        version = self._current.version + 1
+        try:
+            print(f"🔄 Building retrieval context v{version} in the background...")
+            index = load_index()
+            if index is None:
+                raise RuntimeError("index could not be loaded")
+            context = build_retrieval_context(index, version, build=build)
+            if context.hybrid_retriever is None:
+                raise RuntimeError("retrievers could not be initialized")
+
+            # Pay lazy initialization (query embedding, BM25 tokenizer) before going live
+            context.hybrid_retriever.retrieve(WARMUP_QUERY)
+        except Exception as e:
+            print(f"❌ Retrieval context reload failed, keeping v{self._current.version}: {e}")
+            self.last_reload_error = str(e)
+            return
+
+        self.last_reload_error = None
+        self.swap(context)
+
+    def status(self):
+        with self._condition:
+            return {
+                "version": self._current.version,
+                "build_id": self._current.build_id,
+                "created_at": self._current.created_at,
+                "ready": self._current.hybrid_retriever is not None,
+                "symptom_keys": len(self._current.symptom_index or ()),
+                "reloading": self.is_reloading(),
+                "in_flight": dict(self._in_flight),
+                "last_reload_error": self.last_reload_error,
+            }
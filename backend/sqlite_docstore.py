@@ -0,0 +1,281 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+from llama_index.core.storage.docstore.simple_docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.utils import json_to_doc
+from llama_index.core.storage.kvstore.types import BaseKVStore, DEFAULT_COLLECTION, DEFAULT_BATCH_SIZE
+
+
+DOCSTORE_FILENAME = "docstore.sqlite"
+LEGACY_DOCSTORE_FILENAME = "docstore.json"
+HOT_NODE_CACHE_SIZE = int(os.getenv("GRAVILOG_DOCSTORE_CACHE_SIZE", "2048"))
+SQLITE_MAX_VARIABLES = 900
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _text_length(value):
+    """Length of a stored node's text, 0 for entries without any (ref doc info, metadata)"""
+    data = value.get("__data__", value) if isinstance(value, dict) else {}
+    text = data.get("text") if isinstance(data, dict) else None
+    return len(text) if isinstance(text, str) and text.strip() else 0
+
+
+class SQLiteKVStore(BaseKVStore):
+    """Key-value store in a single SQLite file.
+
+    Keeps per-collection document and text counters up to date on every write, so
+    corpus statistics never require a scan.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connection() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (collection, key)) WITHOUT ROWID"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS corpus_stats ("
+                "collection TEXT PRIMARY KEY, doc_count INTEGER NOT NULL, "
+                "text_doc_count INTEGER NOT NULL, text_chars INTEGER NOT NULL)"
+            )
+
+    def _connection(self):
+        # One connection per thread, and never one inherited across a fork
+        con = getattr(self._local, "con", None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.db_path, check_same_thread=False)
+            # In WAL mode NORMAL only fsyncs at checkpoints, not on every commit.
+            # VectorStoreIndex adds nodes one at a time, so a rebuild commits thousands of times.
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+            self._local.pid = os.getpid()
+        return con
+
+    def _write(self, con, collection, items):
+        """Insert or replace items and adjust the collection's counters by the difference"""
+        items = dict(items)
+        old_values = {}
+        for keys in _chunks(list(items), SQLITE_MAX_VARIABLES):
+            placeholders = ",".join("?" * len(keys))
+            rows = con.execute(
+                f"SELECT key, value FROM kv WHERE collection = ? AND key IN ({placeholders})",
+                [collection, *keys],
+            )
+            old_values.update((key, json.loads(value)) for key, value in rows)
+
+        doc_delta = text_doc_delta = text_chars_delta = 0
+        for key, value in items.items():
+            if key in old_values:
+                old_length = _text_length(old_values[key])
+                doc_delta -= 1
+                text_doc_delta -= 1 if old_length else 0
+                text_chars_delta -= old_length
+            new_length = _text_length(value)
+            doc_delta += 1
+            text_doc_delta += 1 if new_length else 0
+            text_chars_delta += new_length
+
+        con.executemany(
+            "INSERT OR REPLACE INTO kv (collection, key, value) VALUES (?, ?, ?)",
+            [(collection, key, json.dumps(value)) for key, value in items.items()],
+        )
+        self._update_stats(con, collection, doc_delta, text_doc_delta, text_chars_delta)
+
+    def _update_stats(self, con, collection, doc_delta, text_doc_delta, text_chars_delta):
+        con.execute(
+            "INSERT INTO corpus_stats (collection, doc_count, text_doc_count, text_chars) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT(collection) DO UPDATE SET "
+            "doc_count = doc_count + excluded.doc_count, "
+            "text_doc_count = text_doc_count + excluded.text_doc_count, "
+            "text_chars = text_chars + excluded.text_chars",
+            (collection, doc_delta, text_doc_delta, text_chars_delta),
+        )
+
+    def put(self, key, val, collection=DEFAULT_COLLECTION):
+        con = self._connection()
+        with con:
+            self._write(con, collection, [(key, val)])
+
+    async def aput(self, key, val, collection=DEFAULT_COLLECTION):
+        self.put(key, val, collection=collection)
+
+    def put_all(self, kv_pairs, collection=DEFAULT_COLLECTION, batch_size=DEFAULT_BATCH_SIZE):
+        con = self._connection()
+        for batch in _chunks(list(kv_pairs), max(batch_size, 1)):
+            with con:
+                self._write(con, collection, batch)
+
+    async def aput_all(self, kv_pairs, collection=DEFAULT_COLLECTION, batch_size=DEFAULT_BATCH_SIZE):
+        self.put_all(kv_pairs, collection=collection, batch_size=batch_size)
+
+    def get(self, key, collection=DEFAULT_COLLECTION):
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE collection = ? AND key = ?", (collection, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def aget(self, key, collection=DEFAULT_COLLECTION):
+        return self.get(key, collection=collection)
+
+    def get_many(self, keys, collection=DEFAULT_COLLECTION):
+        """Fetch several keys with one query per SQLITE_MAX_VARIABLES keys"""
+        con = self._connection()
+        found = {}
+        for batch in _chunks(list(keys), SQLITE_MAX_VARIABLES):
+            placeholders = ",".join("?" * len(batch))
+            rows = con.execute(
+                f"SELECT key, value FROM kv WHERE collection = ? AND key IN ({placeholders})",
+                [collection, *batch],
+            )
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def find(self, json_path, value, collection=DEFAULT_COLLECTION):
+        """Entries whose stored JSON has value at json_path, filtered inside SQLite"""
+        rows = self._connection().execute(
+            "SELECT key, value FROM kv WHERE collection = ? AND json_extract(value, ?) = ?",
+            (collection, json_path, value),
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_all(self, collection=DEFAULT_COLLECTION):
+        rows = self._connection().execute(
+            "SELECT key, value FROM kv WHERE collection = ?", (collection,)
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    async def aget_all(self, collection=DEFAULT_COLLECTION):
+        return self.get_all(collection=collection)
+
+    def delete(self, key, collection=DEFAULT_COLLECTION):
+        con = self._connection()
+        with con:
+            row = con.execute(
+                "SELECT value FROM kv WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+            if row is None:
+                return False
+            text_length = _text_length(json.loads(row[0]))
+            con.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+            self._update_stats(con, collection, -1, -1 if text_length else 0, -text_length)
+        return True
+
+    async def adelete(self, key, collection=DEFAULT_COLLECTION):
+        return self.delete(key, collection=collection)
+
+    def collection_stats(self, collection=DEFAULT_COLLECTION):
+        row = self._connection().execute(
+            "SELECT doc_count, text_doc_count, text_chars FROM corpus_stats WHERE collection = ?",
+            (collection,),
+        ).fetchone()
+        doc_count, text_doc_count, text_chars = row or (0, 0, 0)
+        return {"doc_count": doc_count, "text_doc_count": text_doc_count, "text_chars": text_chars}
+
+
+class SQLiteDocumentStore(KVDocumentStore):
+    """Docstore that keeps nodes on disk and only a bounded LRU of hot nodes in memory"""
+
+    def __init__(self, db_path, namespace=None, batch_size=DEFAULT_BATCH_SIZE, cache_size=HOT_NODE_CACHE_SIZE):
+        self._sqlite_kvstore = SQLiteKVStore(db_path)
+        super().__init__(self._sqlite_kvstore, namespace=namespace, batch_size=batch_size)
+        self._hot_nodes = OrderedDict()
+        self._hot_nodes_lock = threading.Lock()
+        self._cache_size = cache_size
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, **kwargs):
+        """Open the SQLite docstore in persist_dir, importing a legacy docstore.json once"""
+        os.makedirs(persist_dir, exist_ok=True)
+        db_path = os.path.join(persist_dir, DOCSTORE_FILENAME)
+        legacy_path = os.path.join(persist_dir, LEGACY_DOCSTORE_FILENAME)
+        needs_import = not os.path.exists(db_path) and os.path.exists(legacy_path)
+
+        docstore = cls(db_path, **kwargs)
+        if needs_import:
+            print(f"🔄 Importing {legacy_path} into {db_path}...")
+            legacy = SimpleDocumentStore.from_persist_path(legacy_path)
+            docstore.add_documents(list(legacy.docs.values()), allow_update=True)
+            print(f"✅ Imported {docstore.corpus_stats()['doc_count']} nodes into the SQLite docstore")
+        return docstore
+
+    def _remember(self, doc_id, doc):
+        with self._hot_nodes_lock:
+            self._hot_nodes[doc_id] = doc
+            self._hot_nodes.move_to_end(doc_id)
+            while len(self._hot_nodes) > self._cache_size:
+                self._hot_nodes.popitem(last=False)
+
+    def _recall(self, doc_id):
+        with self._hot_nodes_lock:
+            doc = self._hot_nodes.get(doc_id)
+            if doc is not None:
+                self._hot_nodes.move_to_end(doc_id)
+            return doc
+
+    def _forget(self, doc_ids):
+        with self._hot_nodes_lock:
+            for doc_id in doc_ids:
+                self._hot_nodes.pop(doc_id, None)
+
+    def get_document(self, doc_id, raise_error=True):
+        doc = self._recall(doc_id)
+        if doc is None:
+            doc = super().get_document(doc_id, raise_error=raise_error)
+            if doc is not None:
+                self._remember(doc_id, doc)
+        return doc
+
+    def get_nodes(self, node_ids, raise_error=True):
+        """Bulk fetch: hot nodes from memory, the rest with batched IN queries"""
+        nodes = {}
+        missing = []
+        for node_id in node_ids:
+            doc = self._recall(node_id)
+            if doc is None:
+                missing.append(node_id)
+            else:
+                nodes[node_id] = doc
+
+        if missing:
+            for node_id, value in self._sqlite_kvstore.get_many(missing, collection=self._node_collection).items():
+                doc = json_to_doc(value)
+                nodes[node_id] = doc
+                self._remember(node_id, doc)
+
+        result = []
+        for node_id in node_ids:
+            if node_id in nodes:
+                result.append(nodes[node_id])
+            elif raise_error:
+                raise ValueError(f"node_id {node_id} not found.")
+        return result
+
+    def add_documents(self, docs, allow_update=True, batch_size=None, store_text=True):
+        self._forget([doc.id_ for doc in docs])
+        super().add_documents(docs, allow_update=allow_update, batch_size=batch_size, store_text=store_text)
+
+    def delete_document(self, doc_id, raise_error=True):
+        self._forget([doc_id])
+        super().delete_document(doc_id, raise_error=raise_error)
+
+    def find_nodes(self, metadata_key, value):
+        """Nodes with metadata[metadata_key] == value, without loading the rest of the corpus"""
+        json_path = f'$.__data__.metadata."{metadata_key}"'
+        entries = self._sqlite_kvstore.find(json_path, value, collection=self._node_collection)
+        return [json_to_doc(entry) for entry in entries.values()]
+
+    def corpus_stats(self):
+        """Node count and text totals, read from counters maintained on write"""
+        return self._sqlite_kvstore.collection_stats(collection=self._node_collection)
@@ -0,0 +1,73 @@
+import re
+import time
+from typing import Any
+
+from llama_index.core.llms import CustomLLM, CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+
+HIGH_RISK_TERMS = ["heavy bleeding", "vision", "won't go away", "severe", "no movement", "not moving"]
+MEDIUM_RISK_TERMS = ["bleeding", "discharge", "headache", "pain", "pressure", "less", "fewer"]
+
+
+class StubLLM(CustomLLM):
+    """Deterministic stand-in for the Groq LLM, used for load tests and offline runs.
+
+    Risk-assessment prompts get a well-formed assessment whose risk level is derived
+    from keywords in the symptom responses; every other prompt gets a fixed answer.
+    """
+
+    latency: float = 0.0
+    context_window: int = 8192
+    num_output: int = 500
+    model_name: str = "gravilog-stub"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name=self.model_name,
+        )
+
+    def _respond(self, prompt):
+        if "Risk Assessment Agent" not in prompt:
+            return ("Based on the medical knowledge provided, this symptom is usually not a cause for "
+                    "concern on its own, but contact your healthcare provider if it gets worse. "
+                    "Risk Level: Low")
+
+        match = re.search(r"SYMPTOM RESPONSES:(.*?)MEDICAL KNOWLEDGE:", prompt, re.DOTALL)
+        symptoms = (match.group(1) if match else prompt).lower()
+
+        if any(term in symptoms for term in HIGH_RISK_TERMS):
+            risk_level, action = "High", "Immediate visit to ER or OB emergency care required"
+        elif any(term in symptoms for term in MEDIUM_RISK_TERMS):
+            risk_level, action = "Medium", "Contact your doctor within 24 hours"
+        else:
+            risk_level, action = "Low", "Continue routine prenatal care and self-monitoring"
+
+        return f"""🏥 Risk Assessment Complete
+**Risk Level:** {risk_level}
+**Recommended Action:** {action}
+
+🔬 Rationale:
+Stub response generated from keyword matching on the reported symptoms."""
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        return CompletionResponse(text=self._respond(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        text = self._respond(prompt)
+        tokens = text.split(" ")
+        delay = self.latency / max(len(tokens), 1)
+        response = ""
+        for i, token in enumerate(tokens):
+            if delay:
+                time.sleep(delay)
+            delta = token if i == 0 else " " + token
+            response += delta
+            yield CompletionResponse(text=response, delta=delta)
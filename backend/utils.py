@@ -1,4 +1,7 @@
 import os
+import json
+import time
+import shutil
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
 from llama_index.core import (SimpleDirectoryReader,Document, VectorStoreIndex, StorageContext, load_index_from_storage)
@@ -8,45 +11,111 @@ from llama_index.readers.file import CSVReader
 from llama_index.vector_stores.pinecone import PineconeVectorStore
 from llama_index.core.settings import Settings
 from llama_index.llms.groq import Groq
+from backend.sqlite_docstore import SQLiteDocumentStore
+from backend.dedup import collapse_near_duplicates
+from backend.csv_rows import load_csv_row_nodes, collapse_duplicate_rows
+from backend.bm25_index import persist_bm25_index
 
 
 
 load_dotenv()
 
+# "stub" swaps in a deterministic local LLM and "local" keeps vectors in ./storage
+# instead of Pinecone, so the app can run (and be load-tested) without external APIs.
+LLM_PROVIDER = os.getenv("GRAVILOG_LLM", "groq")
+VECTOR_STORE_PROVIDER = os.getenv("GRAVILOG_VECTOR_STORE", "pinecone")
+USE_LOCAL_VECTOR_STORE = VECTOR_STORE_PROVIDER == "local"
+# "sqlite" keeps docstore nodes on disk with a small in-memory LRU; "json" is the
+# stock llama_index docstore that loads every node into memory at startup
+DOCSTORE_BACKEND = os.getenv("GRAVILOG_DOCSTORE", "sqlite")
+
+
+BREAKPOINT_PERCENTILE_THRESHOLD = 95
+RERANK_MODEL = 'cross-encoder/ms-marco-MiniLM-L-2-v2'
+DEDUP_CHUNKS = os.getenv("GRAVILOG_DEDUP", "1") == "1"
+KNOWLEDGE_BASE_DIR = "../knowledge_base"
+# Keep every CSV row as its own node with typed column metadata instead of
+# flattening the tables into prose for the semantic splitter
+CSV_ROW_NODES = os.getenv("GRAVILOG_CSV_ROWS", "1") == "1"
+
+# rebuild_index writes every build into its own persist dir and Pinecone namespace and
+# then points CURRENT_BUILD_FILE at it, so servers keep using the old build until they
+# reload. Without a pointer file the live build is the original ./storage and the
+# default namespace.
+STORAGE_DIR = "./storage"
+BUILDS_DIR = "./storage-builds"
+CURRENT_BUILD_FILE = "./storage.current.json"
+
 
 embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
-llm = Groq(
-    model="llama-3.1-8b-instant",  
-    api_key=os.getenv("GROQ_API_KEY"),
-    max_tokens=500,
-    temperature=0.1
-)
+if LLM_PROVIDER == "stub":
+    from backend.stub_llm import StubLLM
+    llm = StubLLM(latency=float(os.getenv("GRAVILOG_STUB_LLM_LATENCY", "0.5")))
+else:
+    llm = Groq(
+        model="llama-3.1-8b-instant",  
+        api_key=os.getenv("GROQ_API_KEY"),
+        max_tokens=500,
+        temperature=0.1
+    )
 
 
 Settings.embed_model = embed_model
 Settings.llm = llm
 
 
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+pc = None if USE_LOCAL_VECTOR_STORE else Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index_name = os.getenv("PINECONE_INDEX")
 
-def get_vector_store():
+def get_current_build():
+    """The live build: {"build_id", "persist_dir", "namespace"} plus the build before it, if any"""
+    try:
+        with open(CURRENT_BUILD_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"build_id": "", "persist_dir": STORAGE_DIR, "namespace": ""}
+
+def set_current_build(build):
+    temp_path = CURRENT_BUILD_FILE + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(build, f)
+    os.replace(temp_path, CURRENT_BUILD_FILE)
+
+def get_vector_store(namespace=""):
     
     pinecone_index = pc.Index(index_name)
-    return PineconeVectorStore(pinecone_index=pinecone_index)
+    return PineconeVectorStore(pinecone_index=pinecone_index, namespace=namespace or None)
 
-def get_storage_context(for_rebuild=False):
+def get_docstore(persist_dir, for_rebuild=False):
+    """SQLite docstore in persist_dir, or None to fall back to llama_index's default"""
+    if DOCSTORE_BACKEND != "sqlite":
+        return None
+    if not for_rebuild and not os.path.exists(persist_dir):
+        return None
+    return SQLiteDocumentStore.from_persist_dir(persist_dir)
+
+def get_storage_context(for_rebuild=False, build=None):
+    
+    build = build or get_current_build()
+    persist_dir = build["persist_dir"]
+    docstore = get_docstore(persist_dir, for_rebuild=for_rebuild)
     
-    vector_store = get_vector_store()
-    persist_dir = "./storage"
+    if USE_LOCAL_VECTOR_STORE:
+        # Vectors live in the default SimpleVectorStore persisted next to the docstore
+        if for_rebuild or not os.path.exists(persist_dir):
+            return StorageContext.from_defaults(docstore=docstore)
+        return StorageContext.from_defaults(docstore=docstore, persist_dir=persist_dir)
+    
+    vector_store = get_vector_store(build["namespace"])
     
     if for_rebuild or not os.path.exists(persist_dir):
     
-        return StorageContext.from_defaults(vector_store=vector_store)
+        return StorageContext.from_defaults(vector_store=vector_store, docstore=docstore)
     else:
     
         return StorageContext.from_defaults(
             vector_store=vector_store,
+            docstore=docstore,
             persist_dir=persist_dir
         )
 
@@ -54,47 +123,74 @@ def get_storage_context(for_rebuild=False):
 
 
 
-def get_and_chunk_documents():
+def get_and_chunk_documents(breakpoint_percentile_threshold=BREAKPOINT_PERCENTILE_THRESHOLD, dedup=DEDUP_CHUNKS, csv_rows=CSV_ROW_NODES):
 
     try:
 
-        file_extractor = {".csv": CSVReader()}
-
+        if csv_rows:
+            row_nodes = load_csv_row_nodes(KNOWLEDGE_BASE_DIR)
+            reader = SimpleDirectoryReader(KNOWLEDGE_BASE_DIR, exclude=["*.csv"])
+        else:
+            row_nodes = []
+            reader = SimpleDirectoryReader(KNOWLEDGE_BASE_DIR, file_extractor={".csv": CSVReader()})
 
-        documents = SimpleDirectoryReader(
-            "../knowledge_base", 
-            file_extractor=file_extractor
-        ).load_data()
+        try:
+            documents = reader.load_data()
+        except ValueError as e:
+            # The knowledge base may hold nothing but CSVs
+            if not row_nodes:
+                raise
+            print(f"⚠️ No prose documents loaded: {e}")
+            documents = []
 
         print(f"📖 Loaded {len(documents)} documents")
 
         node_parser = SemanticSplitterNodeParser(
             buffer_size=1, 
-            breakpoint_percentile_threshold=95, 
+            breakpoint_percentile_threshold=breakpoint_percentile_threshold, 
             embed_model=embed_model
         )
 
         nodes = node_parser.get_nodes_from_documents(documents)
         print(f"📄 Created {len(nodes)} document chunks")
-        return nodes
+        
+        if dedup:
+            nodes, report = collapse_near_duplicates(nodes)
+            print(f"🧹 Collapsed {report['removed_nodes']} near-duplicate chunks into {report['clusters']} canonical chunks: "
+                  f"{report['input_nodes']} → {report['output_nodes']} chunks "
+                  f"({report['node_reduction']:.1%} fewer, {report['char_reduction']:.1%} less text)")
+
+            # Rows are compared cell by cell instead: short rows that only differ in the
+            # symptom look alike to MinHash but say different things
+            row_nodes, row_report = collapse_duplicate_rows(row_nodes)
+            print(f"🧹 Merged {row_report['removed_rows']} CSV rows that only differ in their symptoms: "
+                  f"{row_report['input_rows']} → {row_report['output_rows']} rows "
+                  f"({row_report['row_reduction']:.1%} fewer)")
+
+        return nodes + row_nodes
 
     except Exception as e:
         print(f"❌ Error loading documents: {e}")
         return []
 
 
-def get_index():
+def get_index(build=None):
 
+    build = build or get_current_build()
     try:
-        storage_context = get_storage_context()
+        storage_context = get_storage_context(build=build)
 
         return load_index_from_storage(storage_context)
     except Exception as e:
+        if USE_LOCAL_VECTOR_STORE:
+            print(f"❌ Local vector store not found in {build['persist_dir']}, run insert_to_vectorstore.py first: {e}")
+            return None
+        
         print(f"⚠️ Local storage not found, creating index from existing Pinecone data...")
         try:
 
-            vector_store = get_vector_store()
-            storage_context = get_storage_context()
+            vector_store = get_vector_store(build["namespace"])
+            storage_context = get_storage_context(build=build)
             index = VectorStoreIndex.from_vector_store(
                 vector_store=vector_store,
                 storage_context=storage_context
@@ -106,10 +202,15 @@ def get_index():
 
 def check_index_status():
 
+    if USE_LOCAL_VECTOR_STORE:
+        index = get_index()
+        if index is None:
+            return False
+        print(f"✅ Local index found in {get_current_build()['persist_dir']}")
+        return True
+
     try:
-        pinecone_index = pc.Index(index_name)
-        stats = pinecone_index.describe_index_stats()
-        vector_count = stats.get('total_vector_count', 0)
+        vector_count = count_namespace_vectors(get_current_build()["namespace"])
         
         if vector_count > 0:
             print(f"✅ Index found with {vector_count} vectors")
@@ -122,23 +223,31 @@ def check_index_status():
         return False
     
 
+def count_namespace_vectors(namespace=""):
+    stats = pc.Index(index_name).describe_index_stats()
+    summary = stats.get('namespaces', {}).get(namespace)
+    return summary['vector_count'] if summary else 0
+
 
-def clear_pinecone_index():
-    """Delete all vectors from Pinecone index"""
+def clear_pinecone_index(namespace=""):
+    """Delete all vectors in one namespace of the Pinecone index (the default namespace unless given)"""
+    if USE_LOCAL_VECTOR_STORE:
+        print("ℹ️ Using local vector store, nothing to clear in Pinecone")
+        return True
+    
     try:
         pinecone_index = pc.Index(index_name)
         
 
-        stats = pinecone_index.describe_index_stats()
-        vector_count = stats.get('total_vector_count', 0)
-        print(f"🗑️ Current vectors in index: {vector_count}")
+        vector_count = count_namespace_vectors(namespace)
+        print(f"🗑️ Current vectors in namespace '{namespace}': {vector_count}")
         
         if vector_count > 0:
 
-            pinecone_index.delete(delete_all=True)
-            print("✅ All vectors deleted from Pinecone index")
+            pinecone_index.delete(delete_all=True, namespace=namespace)
+            print(f"✅ All vectors deleted from namespace '{namespace}'")
         else:
-            print("ℹ️ Index is already empty")
+            print("ℹ️ Namespace is already empty")
             
         return True
         
@@ -146,21 +255,31 @@ def clear_pinecone_index():
         print(f"❌ Error clearing index: {e}")
         return False
 
+def delete_build(build):
+    """Remove a build's persist dir and Pinecone namespace"""
+    clear_pinecone_index(build["namespace"])
+    if os.path.exists(build["persist_dir"]):
+        try:
+            shutil.rmtree(build["persist_dir"])
+            print(f"🗑️ Cleared {build['persist_dir']}")
+        except OSError as e:
+            print(f"❌ Error clearing {build['persist_dir']}: {e}")
+
 def rebuild_index():
-    """Clear old data and rebuild index with new CSV processing"""
+    """Build the index into a new persist dir and Pinecone namespace, then make it the live build.
+
+    Nothing the running servers use is touched: they keep serving the previous build
+    until they reload (POST /admin/retrieval/reload or SIGHUP). The build before the
+    previous one is deleted once the new one is live.
+    """
+    build_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    build = {
+        "build_id": build_id,
+        "persist_dir": os.path.join(BUILDS_DIR, build_id),
+        "namespace": f"build-{build_id}",
+    }
     try:
-        print("🔄 Starting index rebuild process...")
-        
-
-        if not clear_pinecone_index():
-            print("❌ Failed to clear index, aborting rebuild")
-            return None
-        
-
-        import shutil
-        if os.path.exists("./storage"):
-            shutil.rmtree("./storage")
-            print("🗑️ Cleared local storage")
+        print(f"🔄 Starting index rebuild into {build['persist_dir']}...")
         
 
         nodes = get_and_chunk_documents()
@@ -170,15 +289,29 @@ def rebuild_index():
             return None
         
 
-        storage_context = get_storage_context(for_rebuild=True)
-        index = VectorStoreIndex(nodes, storage_context=storage_context)
+        storage_context = get_storage_context(for_rebuild=True, build=build)
+        # Pinecone stores the node text itself, so llama_index would otherwise leave the
+        # docstore empty, and BM25 and the symptom index are built from the docstore
+        index = VectorStoreIndex(nodes, storage_context=storage_context, store_nodes_override=True)
         
 
-        index.storage_context.persist(persist_dir="./storage")
-        
-        print(f"✅ Index rebuilt successfully with {len(nodes)} nodes")
-        return index
+        index.storage_context.persist(persist_dir=build["persist_dir"])
+        bm25_count = persist_bm25_index(nodes, build["persist_dir"])
+        print(f"💾 Saved the BM25 index over {bm25_count} nodes")
         
     except Exception as e:
         print(f"❌ Error rebuilding index: {e}")
-        return None
\ No newline at end of file
+        delete_build(build)
+        return None
+
+    current = get_current_build()
+    superseded = current.pop("previous", None)
+    build["previous"] = current
+    set_current_build(build)
+    print(f"✅ Index rebuilt successfully with {len(nodes)} nodes, build {build_id} is live")
+    print("ℹ️ Running servers pick it up after POST /admin/retrieval/reload or SIGHUP")
+
+    if superseded:
+        print(f"🗑️ Removing superseded build {superseded['build_id'] or STORAGE_DIR}")
+        delete_build(superseded)
+    return index
@@ -3,17 +3,24 @@ import os
 import sys
 from datetime import datetime
 import traceback
+import threading
+from collections import OrderedDict
 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 
-from backend.rag_functions import get_direct_answer, get_answer_with_query_engine
+from backend.rag_functions import stream_direct_answer, get_answer_with_query_engine
+from backend.assessment import SYMPTOM_QUESTIONS, build_symptom_summary, parse_risk_level, run_risk_assessment
 from backend.utils import get_index
+from backend.profiling import profiled
+from backend.api import app as api_app, router as api_router
+from backend.rag_functions import start_reload_watcher
 print("✅ Successfully imported RAG functions")
 
 class PregnancyRiskAgent:
-    def __init__(self):
+    def __init__(self, session_id=None):
+        self.session_id = session_id
         self.conversation_history = []  
         self.current_symptoms = {}
         self.risk_assessment_done = False
@@ -21,13 +28,7 @@ class PregnancyRiskAgent:
         self.last_user_query = ""  
         
         
-        self.symptom_questions = [
-            "Are you currently experiencing any unusual bleeding or discharge?",
-            "How would you describe your baby's movements today compared to yesterday?",
-            "Have you had any headaches that won't go away or that affect your vision?",
-            "Do you feel any pressure or pain in your pelvis or lower back?",
-            "Are you experiencing any other symptoms? (If yes, please describe briefly)"
-        ]
+        self.symptom_questions = list(SYMPTOM_QUESTIONS)
         
         self.current_question_index = 0
         self.waiting_for_first_response = True
@@ -66,7 +67,9 @@ class PregnancyRiskAgent:
         user_lower = user_input.lower()
         return any(indicator in user_lower for indicator in follow_up_indicators)
     
+    @profiled("process_user_input")
     def process_user_input(self, user_input, chat_history):
+        """Handle one chat turn, yielding the response so far; follow-up answers are streamed"""
         try:
             self.last_user_query = user_input
             self.add_to_conversation_history("user", user_input)
@@ -84,7 +87,7 @@ class PregnancyRiskAgent:
                     self.risk_assessment_done = True
                 
                 self.add_to_conversation_history("assistant", bot_response)
-                return bot_response
+                yield bot_response
             
             
             elif self.current_question_index < len(self.symptom_questions) and not self.risk_assessment_done:
@@ -98,22 +101,24 @@ class PregnancyRiskAgent:
                     self.risk_assessment_done = True
                 
                 self.add_to_conversation_history("assistant", bot_response)
-                return bot_response
+                yield bot_response
             
             
             else:
-                bot_response = self.handle_follow_up_conversation(user_input)
+                bot_response = ""
+                for bot_response in self.handle_follow_up_conversation(user_input):
+                    yield bot_response
                 self.add_to_conversation_history("assistant", bot_response)
-                return bot_response
                 
         except Exception as e:
             print(f"❌ Error in process_user_input: {e}")
             traceback.print_exc()
             error_response = "I encountered an error. Please try again or consult your healthcare provider."
             self.add_to_conversation_history("assistant", error_response)
-            return error_response
+            yield error_response
     
     def handle_follow_up_conversation(self, user_input):
+        """Yield the answer so far as the LLM streams it"""
         try:
             print(f"🔍 Processing follow-up question: {user_input}")
             
@@ -122,81 +127,40 @@ class PregnancyRiskAgent:
             
             if any(word in user_input.lower() for word in ["last", "previous", "what did i ask", "my question"]):
                 if self.last_user_query:
-                    return f"Your last question was: \"{self.last_user_query}\"\n\nWould you like me to elaborate on that topic or do you have a different question?"
+                    yield f"Your last question was: \"{self.last_user_query}\"\n\nWould you like me to elaborate on that topic or do you have a different question?"
                 else:
-                    return "I don't have a record of your previous question. Could you please rephrase what you'd like to know?"
+                    yield "I don't have a record of your previous question. Could you please rephrase what you'd like to know?"
+                return
             
-            rag_response = get_direct_answer(user_input, symptom_summary, conversation_context=conversation_context, is_risk_assessment=False)
+            rag_response = ""
+            for delta in stream_direct_answer(user_input, symptom_summary, conversation_context=conversation_context, is_risk_assessment=False):
+                rag_response += delta
+                yield f"""Based on your symptoms and medical literature:
+
+{rag_response}"""
             
             if "Error" in rag_response or len(rag_response) < 50:
                 print("🔄 Trying alternative method...")
                 rag_response = get_answer_with_query_engine(user_input)
-            
-            bot_response = f"""Based on your symptoms and medical literature:
+                yield f"""Based on your symptoms and medical literature:
 
 {rag_response}"""
             
-            return bot_response
-            
         except Exception as e:
             print(f"❌ Error in follow-up conversation: {e}")
-            return "I encountered an error processing your question. Could you please rephrase it or consult your healthcare provider?"
+            yield "I encountered an error processing your question. Could you please rephrase it or consult your healthcare provider?"
         
     def create_symptom_summary(self):
-        if not self.current_symptoms:
-            return "No specific symptoms reported yet"
-            
-        summary_parts = []
-        for i, (key, response) in enumerate(self.current_symptoms.items()):
-            if i < len(self.symptom_questions):
-                question = self.symptom_questions[i]
-                summary_parts.append(f"{question}: {response}")
-        return "\n".join(summary_parts)
+        return build_symptom_summary(list(self.current_symptoms.values()))
 
     def parse_risk_level(self, text):
-        import re
-        
-        patterns = [
-            r'\*\*Risk Level:\*\*\s*(Low|Medium|High)',  
-            r'Risk Level:\s*\*\*(Low|Medium|High)\*\*',  
-            r'Risk Level:\s*(Low|Medium|High)',          
-            r'\*\*Risk Level:\*\*\s*<(Low|Medium|High)>', 
-            r'Risk Level.*?<(Low|Medium|High)>',          
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                risk_level = match.group(1).capitalize()
-                print(f"✅ Successfully parsed risk level: {risk_level}")
-                return risk_level
-        
-        print(f"❌ Could not parse risk level from: {text[:200]}...")
-        return None
+        return parse_risk_level(text)
 
     def provide_risk_assessment(self):
-        all_symptoms = self.create_symptom_summary()
-        
-        rag_query = f"Analyze these pregnancy symptoms for risk assessment:\n{all_symptoms}\n\nProvide risk level and medical recommendations."
-        detailed_analysis = get_direct_answer(rag_query, all_symptoms, is_risk_assessment=True)
-
-        print(f"🔍 RAG Response: {detailed_analysis[:300]}...")
-        
-        llm_risk_level = self.parse_risk_level(detailed_analysis)
-        
-        if llm_risk_level:
-            risk_level = llm_risk_level
-            
-            if risk_level == "Low":
-                action = "✅ Continue routine prenatal care and self-monitoring"
-            elif risk_level == "Medium":
-                action = "⚠️ Contact your doctor within 24 hours"
-            elif risk_level == "High":
-                action = "🚨 Immediate visit to ER or OB emergency care required"
-        else:
-            print("⚠️ RAG assessment failed, using fallback")
-            risk_level = "Medium"
-            action = "⚠️ Contact your doctor within 24 hours"
+        result = run_risk_assessment(list(self.current_symptoms.values()))
+        risk_level = result["risk_level"]
+        action = result["recommended_action"]
+        detailed_analysis = result["analysis"]
 
         symptom_list = []
         for i, (key, symptom) in enumerate(self.current_symptoms.items()):
@@ -246,26 +210,44 @@ Are you currently experiencing any unusual bleeding or discharge?
 ⚠️ **Important**: This tool is for informational purposes only and should not replace professional medical care. In case of emergency, contact your healthcare provider immediately."""
 
 
-def create_new_agent():
+def create_new_agent(session_id=None):
     
-    return PregnancyRiskAgent()
-
-
-agent = create_new_agent()
+    print(f"🆕 New session: {session_id}")
+    return PregnancyRiskAgent(session_id=session_id)
+
+
+# One agent per browser session. Under the multi-worker server (frontend/serve.py)
+# sessions are routed stickily, so each worker only holds its own sessions.
+MAX_ACTIVE_SESSIONS = int(os.getenv("GRAVILOG_MAX_SESSIONS", "1000"))
+agents = OrderedDict()
+agents_lock = threading.Lock()
+
+def get_session_id(request):
+    return getattr(request, "session_hash", None) or "default"
+
+def get_agent(request, reset=False):
+    session_id = get_session_id(request)
+    with agents_lock:
+        agent = agents.pop(session_id, None)
+        if agent is None or reset:
+            agent = create_new_agent(session_id)
+        agents[session_id] = agent
+        
+        while len(agents) > MAX_ACTIVE_SESSIONS:
+            agents.popitem(last=False)
+    return agent
 
-def chat_interface_with_reset(user_input, history):
-    global agent
+def chat_interface_with_reset(user_input, history, request: gr.Request):
     
     if user_input.lower() in ["reset", "restart", "new assessment"]:
-        agent = create_new_agent()
-        return get_welcome_message()
+        get_agent(request, reset=True)
+        yield get_welcome_message()
+        return
     
-    response = agent.process_user_input(user_input, history)
-    return response
+    yield from get_agent(request).process_user_input(user_input, history)
 
-def reset_chat():
-    global agent
-    agent = create_new_agent()
+def reset_chat(request: gr.Request):
+    get_agent(request, reset=True)
     return [{"role": "assistant", "content": get_welcome_message()}], ""
 
 
@@ -429,6 +411,25 @@ with gr.Blocks(css=custom_css) as demo:
         )
 
 
+def create_app():
+    """The chat UI mounted on the JSON API app from backend/api.py.
+
+    The API's routes are registered first, so /healthz, /readyz, /v1, /admin and /debug
+    take precedence over the Gradio app mounted at the root.
+    """
+    return gr.mount_gradio_app(api_app, demo.queue(), path="/")
+
+
+def attach_api(gradio_app):
+    """Serve the JSON API routes from a launched Gradio app, ahead of Gradio's own routes"""
+    routes = gradio_app.router.routes
+    gradio_routes = list(routes)
+    gradio_app.include_router(api_router)
+    routes[:] = routes[len(gradio_routes):] + gradio_routes
+    # The API's startup event has already passed on this app
+    start_reload_watcher()
+
+
 def check_groq_connection():
     try:
         from backend.utils import llm
@@ -456,22 +457,29 @@ if __name__ == "__main__":
     if is_hf_space:
         print("📍 Running on Hugging Face Spaces")
         print("📍 Each page refresh will start a new conversation")
+    else:
+        print("📍 Running locally")
+        print("📍 Using Groq API for LLM processing")
+        print("📍 Make sure your GROQ_API_KEY is set in environment variables")
+        print("📍 Make sure your Pinecone index is set up and populated")
+        print("📍 The JSON API is served on the same port")
+    
+    # launch() only creates demo.app, so the API routes are added once it is running.
+    # debug=True would block inside launch(); block_thread() below does the same.
+    if is_hf_space:
         demo.queue().launch(
             server_name="0.0.0.0",
             server_port=7860,
             share=False,  
-            debug=False   
+            prevent_thread_lock=True
         )
     else:
-        print("📍 Running locally")
-        print("📍 Using Groq API for LLM processing")
-        print("📍 Make sure your GROQ_API_KEY is set in environment variables")
-        print("📍 Make sure your Pinecone index is set up and populated")
-        
         demo.queue().launch(
             server_name="0.0.0.0",
             server_port=7860,
             share=True,
-            debug=True,
-            show_error=True
-        )
\ No newline at end of file
+            show_error=True,
+            prevent_thread_lock=True
+        )
+    attach_api(demo.app)
+    demo.block_thread()
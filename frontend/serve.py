@@ -0,0 +1,222 @@
+"""Pre-fork multi-worker server for the Gradio app.
+
+The parent process imports the app once, which loads the embedder, reranker,
+docstore and BM25 index, then forks worker processes that share those pages
+copy-on-write. A small router in front pins each Gradio session to one worker
+so the per-session agent state and the queue's event stream stay together.
+Each worker also serves the headless JSON API from backend/api.py, whose
+stateless requests are spread round-robin across the workers.
+Send SIGHUP to the supervisor to hot-swap a rebuilt index into every worker.
+"""
+import gc
+import os
+import itertools
+import signal
+import sys
+import time
+import zlib
+import json
+
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+from app import create_app, check_groq_connection
+
+
+HOST = os.getenv("GRAVILOG_HOST", "0.0.0.0")
+PORT = int(os.getenv("GRAVILOG_PORT", "7860"))
+WORKER_COUNT = int(os.getenv("GRAVILOG_WORKERS", str(os.cpu_count() or 1)))
+WORKER_BASE_PORT = int(os.getenv("GRAVILOG_WORKER_BASE_PORT", str(PORT + 1)))
+
+# Routes served by backend/api.py carry no session state, so any worker can answer them
+API_PATHS = {"/healthz", "/readyz"}
+API_PATH_PREFIXES = ("/v1/", "/admin/", "/debug/")
+api_worker_cycle = itertools.count()
+
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host",
+}
+
+
+def worker_port(worker_index):
+    return WORKER_BASE_PORT + worker_index
+
+
+def find_session_hash(request, body):
+    """Pull the Gradio session hash out of a request, wherever the client put it"""
+    session_hash = request.query_params.get("session_hash")
+    if session_hash:
+        return session_hash
+
+    # /gradio_api/heartbeat/<session_hash>
+    parts = request.url.path.rstrip("/").split("/")
+    if len(parts) >= 2 and parts[-2] == "heartbeat":
+        return parts[-1]
+
+    if body and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(payload, dict):
+            return payload.get("session_hash")
+    return None
+
+
+def is_api_path(path):
+    return path in API_PATHS or path.startswith(API_PATH_PREFIXES)
+
+
+def pick_worker(request, body):
+    """Round-robin for the stateless JSON API, sticky routing for Gradio sessions"""
+    if is_api_path(request.url.path):
+        return next(api_worker_cycle) % WORKER_COUNT
+
+    session_hash = find_session_hash(request, body)
+    if session_hash is None:
+        # Static assets and config are identical on every worker
+        session_hash = request.client.host if request.client else ""
+    return zlib.crc32(session_hash.encode("utf-8")) % WORKER_COUNT
+
+
+def run_router():
+    import httpx
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.background import BackgroundTask
+    from starlette.responses import StreamingResponse
+    from starlette.routing import Route
+
+    client = httpx.AsyncClient(timeout=None)
+
+    async def proxy(request):
+        body = await request.body()
+        port = worker_port(pick_worker(request, body))
+        url = httpx.URL(
+            f"http://127.0.0.1:{port}{request.url.path}",
+            query=request.url.query.encode("utf-8"),
+        )
+        headers = [
+            (key, value) for key, value in request.headers.raw
+            if key.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS
+        ]
+        upstream_request = client.build_request(request.method, url, headers=headers, content=body)
+        upstream = await client.send(upstream_request, stream=True)
+        response_headers = {
+            key: value for key, value in upstream.headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS
+        }
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            background=BackgroundTask(upstream.aclose),
+        )
+
+    methods = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"]
+    router_app = Starlette(routes=[Route("/{path:path}", proxy, methods=methods)])
+    print(f"🔀 Router listening on {HOST}:{PORT} for {WORKER_COUNT} workers")
+    uvicorn.run(router_app, host=HOST, port=PORT, log_level="warning")
+
+
+def run_worker(worker_index):
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // WORKER_COUNT))
+    except ImportError:
+        pass
+
+    import uvicorn
+    from backend.rag_functions import reload_retrieval_context
+
+    # Checked here rather than in the supervisor: an HTTP call before the fork would
+    # leave a pooled keep-alive socket that every worker inherits and shares
+    check_groq_connection()
+
+    # SIGHUP (forwarded by the supervisor) hot-swaps a freshly loaded index
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload_retrieval_context())
+
+    worker_app = create_app()
+
+    port = worker_port(worker_index)
+    print(f"👷 Worker {worker_index} (pid {os.getpid()}) serving on 127.0.0.1:{port}")
+    uvicorn.run(worker_app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def spawn(role, worker_index=0):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        exit_code = 0
+        try:
+            if role == "router":
+                run_router()
+            else:
+                run_worker(worker_index)
+        except Exception as e:
+            print(f"❌ {role} {worker_index} crashed: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+
+def main():
+    print("🚀 Starting GraviLog Pregnancy Risk Assessment Agent (multi-worker)...")
+
+    # Move everything loaded so far out of the GC's reach so that collections in
+    # the workers don't touch (and therefore copy) the shared model pages.
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    shutting_down = False
+
+    def shutdown(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload_workers(signum, frame):
+        print("🔄 Reloading the index in every worker")
+        for pid, (role, worker_index) in list(children.items()):
+            if role == "worker":
+                os.kill(pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGHUP, reload_workers)
+
+    for worker_index in range(WORKER_COUNT):
+        children[spawn("worker", worker_index)] = ("worker", worker_index)
+    children[spawn("router")] = ("router", 0)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        role, worker_index = children.pop(pid, (None, None))
+        if role is None or shutting_down:
+            continue
+
+        print(f"⚠️ {role} {worker_index} (pid {pid}) exited with status {status}, restarting")
+        time.sleep(1)
+        children[spawn(role, worker_index)] = (role, worker_index)
+
+    print("👋 All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
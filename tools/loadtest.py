@@ -0,0 +1,210 @@
+"""End-to-end load generator for the Gradio chat app.
+
+Drives simulated users through the full five-question assessment plus follow-up
+questions using gradio_client, so every request goes through the real queue and
+ChatInterface. Run the server against the stub LLM and local vector store first:
+
+    GRAVILOG_LLM=stub GRAVILOG_VECTOR_STORE=local GRAVILOG_LLM_CACHE_TTL=0 python frontend/app.py
+    python tools/loadtest.py --url http://127.0.0.1:7860 --users 50 --rates 0.5,1,2,4
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from gradio_client import Client
+from gradio_client.utils import Status
+
+
+SYMPTOM_ANSWERS = [
+    ["No", "No bleeding or discharge", "A little spotting this morning", "Yes, heavy bleeding"],
+    ["Same as yesterday", "Moving a lot", "Fewer movements than usual", "I haven't felt any movement today"],
+    ["No headaches", "A mild headache earlier", "Yes, a headache that won't go away and blurry vision"],
+    ["No", "Some lower back pain", "Strong pressure in my pelvis"],
+    ["No", "A bit of nausea", "Swelling in my hands and face"],
+]
+
+FOLLOW_UP_QUESTIONS = [
+    "What causes swelling during pregnancy?",
+    "Is it normal to have back pain in the third trimester?",
+    "When should I be worried about reduced fetal movements?",
+    "What are the warning signs of preeclampsia?",
+    "How long does morning sickness usually last?",
+    "What should I do if the bleeding gets heavier?",
+]
+
+QUEUED_STATUSES = {Status.STARTING, Status.JOINING_QUEUE, Status.IN_QUEUE}
+
+
+def build_script(rng, follow_ups):
+    """One user's conversation: five symptom answers, then follow-up questions"""
+    script = [("question", rng.choice(answers)) for answers in SYMPTOM_ANSWERS]
+    script[-1] = ("assessment", script[-1][1])
+    for question in rng.sample(FOLLOW_UP_QUESTIONS, min(follow_ups, len(FOLLOW_UP_QUESTIONS))):
+        script.append(("follow_up", question))
+    return script
+
+
+def send_message(client, message, api_name, timeout, poll_interval=0.01):
+    """Submit one chat turn and time queue wait, first output and completion.
+
+    Follow-up answers are streamed, so their first output arrives with the first tokens;
+    the other turns produce a single output when they complete.
+    """
+    start = time.perf_counter()
+    job = client.submit(message, api_name=api_name)
+    queue_wait = None
+    ttft = None
+
+    while not job.done():
+        now = time.perf_counter()
+        if now - start > timeout:
+            job.cancel()
+            raise TimeoutError(f"no response after {timeout}s")
+        if queue_wait is None and job.status().code not in QUEUED_STATUSES:
+            queue_wait = now - start
+        if ttft is None and job.outputs():
+            ttft = now - start
+        time.sleep(poll_interval)
+
+    job.result()
+    latency = time.perf_counter() - start
+    return {
+        "queue_wait": queue_wait if queue_wait is not None else latency,
+        "ttft": ttft if ttft is not None else latency,
+        "latency": latency,
+    }
+
+
+def run_user(user_id, args, results, lock):
+    rng = random.Random(args.seed + user_id)
+    script = build_script(rng, args.follow_ups)
+
+    try:
+        client = Client(args.url, verbose=False)
+    except Exception as e:
+        with lock:
+            results.append({"user": user_id, "kind": "connect", "error": str(e)})
+        return
+
+    for kind, message in script:
+        record = {"user": user_id, "kind": kind}
+        try:
+            record.update(send_message(client, message, args.api_name, args.timeout))
+        except Exception as e:
+            record["error"] = str(e)
+        with lock:
+            results.append(record)
+        if "error" in record:
+            # The conversation state is unknown after a failure, so stop this user
+            return
+        if args.think_time > 0:
+            time.sleep(rng.expovariate(1.0 / args.think_time))
+
+
+def run_stage(args, arrival_rate):
+    """Start users as a Poisson process at arrival_rate users/s and wait for all of them"""
+    results = []
+    lock = threading.Lock()
+    threads = []
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    for user_id in range(args.users):
+        thread = threading.Thread(target=run_user, args=(user_id, args, results, lock), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(rng.expovariate(arrival_rate))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return summarize(results, elapsed, arrival_rate)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(results, elapsed, arrival_rate):
+    ok = [r for r in results if "error" not in r]
+    errors = [r for r in results if "error" in r]
+    summary = {
+        "arrival_rate": arrival_rate,
+        "requests": len(results),
+        "errors": len(errors),
+        "error_rate": len(errors) / len(results) if results else 0.0,
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "elapsed": elapsed,
+        "by_kind": {},
+    }
+    for kind in ["question", "assessment", "follow_up"]:
+        rows = [r for r in ok if r["kind"] == kind]
+        summary["by_kind"][kind] = {
+            metric: {
+                "p50": percentile([r[metric] for r in rows], 0.50),
+                "p90": percentile([r[metric] for r in rows], 0.90),
+                "p99": percentile([r[metric] for r in rows], 0.99),
+            }
+            for metric in ["queue_wait", "ttft", "latency"]
+        }
+        summary["by_kind"][kind]["count"] = len(rows)
+    if errors:
+        summary["sample_errors"] = sorted({r["error"] for r in errors})[:5]
+    return summary
+
+
+def format_seconds(value):
+    return "   -  " if value is None else f"{value:6.2f}"
+
+
+def print_summary(summary):
+    print(f"\n📈 Arrival rate {summary['arrival_rate']:.2f} users/s: "
+          f"{summary['requests']} requests in {summary['elapsed']:.1f}s, "
+          f"throughput {summary['throughput']:.2f} req/s, "
+          f"error rate {summary['error_rate']:.1%}")
+    print(f"   {'kind':<11} {'n':>5}  {'queue p50':>9} {'p90':>6}  {'ttft p50':>9} {'p90':>6}  "
+          f"{'total p50':>9} {'p90':>6} {'p99':>6}")
+    for kind, stats in summary["by_kind"].items():
+        print(f"   {kind:<11} {stats['count']:>5}  "
+              f"{format_seconds(stats['queue_wait']['p50']):>9} {format_seconds(stats['queue_wait']['p90'])}  "
+              f"{format_seconds(stats['ttft']['p50']):>9} {format_seconds(stats['ttft']['p90'])}  "
+              f"{format_seconds(stats['latency']['p50']):>9} {format_seconds(stats['latency']['p90'])} "
+              f"{format_seconds(stats['latency']['p99'])}")
+    for error in summary.get("sample_errors", []):
+        print(f"   ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:7860")
+    parser.add_argument("--api-name", default="/chat")
+    parser.add_argument("--users", type=int, default=20, help="simulated users per stage")
+    parser.add_argument("--rates", default="1", help="comma-separated user arrival rates (users/s), one stage each")
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between a user's messages")
+    parser.add_argument("--follow-ups", type=int, default=2, help="follow-up questions after the assessment")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-message timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write all stage summaries to this file")
+    args = parser.parse_args()
+
+    summaries = []
+    for rate in [float(r) for r in args.rates.split(",")]:
+        print(f"🚀 Running {args.users} users at {rate} users/s against {args.url}")
+        summary = run_stage(args, rate)
+        print_summary(summary)
+        summaries.append(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
+        print(f"\n💾 Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
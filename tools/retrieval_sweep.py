@@ -0,0 +1,265 @@
+"""Retrieval quality-vs-latency sweep.
+
+Runs a labeled set of questions through the retrieval pipeline from
+backend/rag_functions.py (vector + BM25, reciprocal rank fusion, cross-encoder
+reranking, pregnancy keyword filter, context character budget) for every
+combination of the given parameters, with and without the adaptive mode from
+backend/adaptive_retrieval.py (GRAVILOG_ADAPTIVE_* settings apply). Each configuration gets recall@k, MRR,
+per-stage latency and context token cost, and the Pareto frontier is marked.
+
+Labels are JSON lines; a chunk counts as relevant if its node id is listed in
+"expected_ids" or it contains one of the "expected_text" snippets (snippets are
+stable across chunking settings, node ids are not):
+
+    {"question": "Is spotting normal in the first trimester?", "expected_text": ["light spotting"]}
+
+Indexes are built in memory with the local embedding model; Pinecone is not used.
+
+    python tools/retrieval_sweep.py --labels eval/labels.jsonl --vector-k 5,10,15 --thresholds 90,95
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+# Build everything locally; the sweep never needs Pinecone or a real LLM
+os.environ.setdefault("GRAVILOG_VECTOR_STORE", "local")
+os.environ.setdefault("GRAVILOG_LLM", "stub")
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.postprocessor import SentenceTransformerRerank
+from llama_index.core.utils import get_tokenizer
+from llama_index.retrievers.bm25 import BM25Retriever
+
+from backend.utils import get_and_chunk_documents, embed_model, RERANK_MODEL
+from backend.adaptive_retrieval import fuse_results, select_pool, plan_rerank, VECTOR_LEG, BM25_LEG
+from backend.context_builder import filter_pregnancy_nodes, select_context
+from backend.retrieval_context import WARMUP_QUERY
+
+
+PARAMETERS = ["threshold", "adaptive", "vector_k", "bm25_k", "fusion_k", "context_nodes", "context_chars"]
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_labels(path):
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                example = json.loads(line)
+                example["expected_ids"] = set(example.get("expected_ids", []))
+                example["expected_text"] = [t.lower() for t in example.get("expected_text", [])]
+                examples.append(example)
+    return examples
+
+
+def matched_expectations(example, node, text):
+    """Expected ids / snippets that this chunk satisfies"""
+    matched = set()
+    if node.node_id in example["expected_ids"]:
+        matched.add(("id", node.node_id))
+    lowered = text.lower()
+    for snippet in example["expected_text"]:
+        if snippet in lowered:
+            matched.add(("text", snippet))
+    return matched
+
+
+def score_ranking(example, ranked):
+    """(recall, reciprocal rank) of a ranked list of (node, text) pairs"""
+    expected = len(example["expected_ids"]) + len(example["expected_text"])
+    found = set()
+    reciprocal_rank = 0.0
+    for position, (node, text) in enumerate(ranked):
+        matched = matched_expectations(example, node, text)
+        if matched and not reciprocal_rank:
+            reciprocal_rank = 1.0 / (position + 1)
+        found |= matched
+    return (len(found) / expected if expected else 0.0), reciprocal_rank
+
+
+class CorpusRetrievers:
+    """In-memory vector and BM25 retrievers over one chunking of the knowledge base"""
+
+    def __init__(self, threshold):
+        print(f"📄 Chunking knowledge base with breakpoint_percentile_threshold={threshold}...")
+        self.nodes = get_and_chunk_documents(breakpoint_percentile_threshold=threshold)
+        if not self.nodes:
+            raise RuntimeError("No chunks produced from the knowledge base")
+        self.node_count = len(self.nodes)
+        self.index = VectorStoreIndex(self.nodes, embed_model=embed_model)
+        self._retrievers = {}
+        self._results = {}
+
+        # Pay one-off model and tokenizer initialization before anything is timed
+        for leg in ("vector", "bm25"):
+            self._retriever(leg, 1).retrieve(WARMUP_QUERY)
+
+    def _retriever(self, leg, k):
+        key = (leg, k)
+        if key not in self._retrievers:
+            if leg == "vector":
+                self._retrievers[key] = self.index.as_retriever(similarity_top_k=k)
+            else:
+                self._retrievers[key] = BM25Retriever.from_defaults(nodes=self.nodes, similarity_top_k=k)
+        return self._retrievers[key]
+
+    def retrieve(self, leg, question, k):
+        """Top-k results for a leg and the time a query at that depth took (measured once per depth)"""
+        key = (leg, question, k)
+        if key not in self._results:
+            retriever = self._retriever(leg, k)
+            start = time.perf_counter()
+            results = sorted(retriever.retrieve(question), key=lambda n: n.score or 0.0, reverse=True)
+            self._results[key] = (results, time.perf_counter() - start)
+        return self._results[key]
+
+
+def evaluate_config(config, corpus, examples, reranker, tokenizer):
+    totals = {"recall": 0.0, "pool_recall": 0.0, "mrr": 0.0, "tokens": 0.0,
+              "vector_s": 0.0, "bm25_s": 0.0, "fusion_s": 0.0, "rerank_s": 0.0,
+              "widened": 0.0, "rerank_skipped": 0.0}
+
+    for example in examples:
+        question = example["question"]
+        vector_nodes, vector_seconds = corpus.retrieve("vector", question, config["vector_k"])
+        bm25_nodes, bm25_seconds = corpus.retrieve("bm25", question, config["bm25_k"])
+
+        start = time.perf_counter()
+        if config["adaptive"]:
+            pool, contenders, widened = select_pool(
+                [(VECTOR_LEG, vector_nodes), (BM25_LEG, bm25_nodes)], config["fusion_k"]
+            )
+        else:
+            pool = fuse_results([vector_nodes, bm25_nodes], config["fusion_k"])
+        fusion_seconds = time.perf_counter() - start
+
+        # The rerank cache is left out so that every configuration pays for its cross-encoder calls
+        start = time.perf_counter()
+        if config["adaptive"]:
+            path, candidates = plan_rerank(pool, contenders, config["context_nodes"])
+            if path == "rerank_skipped":
+                reranked = candidates
+            else:
+                reranked = reranker.postprocess_nodes(list(candidates), query_str=question)[:config["context_nodes"]]
+            totals["widened"] += widened
+            totals["rerank_skipped"] += path == "rerank_skipped"
+        else:
+            reranked = reranker.postprocess_nodes(list(pool), query_str=question)[:config["context_nodes"]]
+        rerank_seconds = time.perf_counter() - start
+
+        context = select_context(
+            filter_pregnancy_nodes(reranked, config["context_nodes"], verbose=False), config["context_chars"]
+        )
+        recall, reciprocal_rank = score_ranking(example, context)
+        pool_recall, _ = score_ranking(example, [(n.node, n.node.get_content()) for n in pool])
+
+        totals["recall"] += recall
+        totals["pool_recall"] += pool_recall
+        totals["mrr"] += reciprocal_rank
+        totals["tokens"] += len(tokenizer("\n\n---\n\n".join(text for _, text in context)))
+        totals["vector_s"] += vector_seconds
+        totals["bm25_s"] += bm25_seconds
+        totals["fusion_s"] += fusion_seconds
+        totals["rerank_s"] += rerank_seconds
+
+    result = dict(config)
+    result.update({metric: value / len(examples) for metric, value in totals.items()})
+    result["latency_s"] = result["vector_s"] + result["bm25_s"] + result["fusion_s"] + result["rerank_s"]
+    return result
+
+
+def mark_pareto_frontier(results):
+    """Flag results not dominated on (higher recall, lower latency, fewer tokens)"""
+    for result in results:
+        result["pareto"] = not any(
+            other["recall"] >= result["recall"]
+            and other["latency_s"] <= result["latency_s"]
+            and other["tokens"] <= result["tokens"]
+            and (other["recall"] > result["recall"]
+                 or other["latency_s"] < result["latency_s"]
+                 or other["tokens"] < result["tokens"])
+            for other in results
+        )
+
+
+def print_results(results):
+    header = (f"   {'thr':>4} {'ada':>3} {'vec':>4} {'bm25':>4} {'fuse':>4} {'ctx':>4} {'chars':>6}  "
+              f"{'recall':>6} {'pool':>6} {'mrr':>6} {'tokens':>7}  "
+              f"{'vec ms':>7} {'bm25 ms':>7} {'rrk ms':>7} {'total':>7}  {'wide':>5} {'skip':>5}")
+    print(header)
+    for r in sorted(results, key=lambda r: (r["latency_s"], r["tokens"])):
+        print(f"{'★' if r['pareto'] else ' '}  {r['threshold']:>4} {r['adaptive']:>3} {r['vector_k']:>4} {r['bm25_k']:>4} "
+              f"{r['fusion_k']:>4} {r['context_nodes']:>4} {r['context_chars']:>6}  "
+              f"{r['recall']:>6.3f} {r['pool_recall']:>6.3f} {r['mrr']:>6.3f} {r['tokens']:>7.0f}  "
+              f"{r['vector_s'] * 1000:>7.1f} {r['bm25_s'] * 1000:>7.1f} {r['rerank_s'] * 1000:>7.1f} "
+              f"{r['latency_s'] * 1000:>7.1f}  {r['widened']:>5.0%} {r['rerank_skipped']:>5.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", required=True, help="JSON lines file of labeled questions")
+    parser.add_argument("--thresholds", default="95", help="breakpoint_percentile_threshold values")
+    parser.add_argument("--adaptive", default="0,1", help="0 for the standard pipeline, 1 for adaptive retrieval")
+    parser.add_argument("--vector-k", default="5,10,15")
+    parser.add_argument("--bm25-k", default="5,10,15")
+    parser.add_argument("--fusion-k", default="10,20")
+    parser.add_argument("--context-nodes", default="4,8")
+    parser.add_argument("--context-chars", default="3000,6000")
+    parser.add_argument("--target-recall", type=float, default=0.9,
+                        help="recommend the cheapest configuration with at least this recall")
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    examples = load_labels(args.labels)
+    grid = {
+        "threshold": parse_ints(args.thresholds),
+        "adaptive": parse_ints(args.adaptive),
+        "vector_k": parse_ints(args.vector_k),
+        "bm25_k": parse_ints(args.bm25_k),
+        "fusion_k": parse_ints(args.fusion_k),
+        "context_nodes": parse_ints(args.context_nodes),
+        "context_chars": parse_ints(args.context_chars),
+    }
+    print(f"🧪 {len(examples)} labeled questions, "
+          f"{len(list(itertools.product(*grid.values())))} configurations")
+
+    reranker = SentenceTransformerRerank(model=RERANK_MODEL, top_n=max(grid["fusion_k"]))
+    tokenizer = get_tokenizer()
+
+    results = []
+    for threshold in grid["threshold"]:
+        corpus = CorpusRetrievers(threshold)
+        for values in itertools.product(*(grid[name] for name in PARAMETERS[1:])):
+            config = dict(zip(PARAMETERS, (threshold, *values)))
+            result = evaluate_config(config, corpus, examples, reranker, tokenizer)
+            result["chunks"] = corpus.node_count
+            results.append(result)
+
+    mark_pareto_frontier(results)
+    print()
+    print_results(results)
+
+    eligible = [r for r in results if r["recall"] >= args.target_recall]
+    if eligible:
+        best = min(eligible, key=lambda r: (r["latency_s"], r["tokens"]))
+        chosen = ", ".join(f"{name}={best[name]}" for name in PARAMETERS)
+        print(f"\n✅ Cheapest configuration with recall >= {args.target_recall}: {chosen} "
+              f"(recall {best['recall']:.3f}, {best['latency_s'] * 1000:.1f} ms, {best['tokens']:.0f} tokens)")
+    else:
+        print(f"\n❌ No configuration reaches recall {args.target_recall}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()